@@ -24,6 +24,7 @@ def create_app():
     from routes.parking import parking_bp
     from routes.recommendation import recommendation_bp
     from routes.allocation import allocation_bp
+    from routes.metrics import metrics_bp
 
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(events_bp, url_prefix="/events")
@@ -33,6 +34,11 @@ def create_app():
     app.register_blueprint(data_bp, url_prefix="/data")
     app.register_blueprint(recommendation_bp, url_prefix="/recommendation")
     app.register_blueprint(allocation_bp, url_prefix="/allocation")
+    app.register_blueprint(metrics_bp, url_prefix="/metrics")
+
+    from utils.activity_log import rollup_user_log_command
+
+    app.cli.add_command(rollup_user_log_command)
 
     with app.app_context():
         for rule in app.url_map.iter_rules():
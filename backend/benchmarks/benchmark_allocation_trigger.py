@@ -0,0 +1,118 @@
+"""
+Insert 10k parking_lot_allocation rows with the statement-level capacity trigger and with the former
+row-level trigger, and report the time of each insert.
+
+Everything runs in one transaction that is rolled back at the end, including the temporary swap to the
+row-level trigger, so the database is left unchanged.
+
+Usage (from the backend directory, DATABASE_URL set):
+    python -m benchmarks.benchmark_allocation_trigger [rows]
+"""
+
+import sys
+import time
+from datetime import timedelta
+
+from app import create_app
+from extensions import db
+from sqlalchemy import text
+
+ROW_LEVEL_TRIGGER = """
+CREATE OR REPLACE FUNCTION benchmark_check_allocation_within_capacity_row() RETURNS TRIGGER AS $$
+DECLARE
+    total_allocated_capacity INTEGER;
+    available_capacity INTEGER;
+BEGIN
+    SELECT SUM(allocated_capacity)
+    INTO total_allocated_capacity
+    FROM public.parking_lot_allocation
+    WHERE parking_lot_id = NEW.parking_lot_id
+    AND date = NEW.date
+    AND event_id != NEW.event_id;
+
+    SELECT capacity INTO available_capacity
+    FROM public.parking_lot_capacity
+    WHERE parking_lot_id = NEW.parking_lot_id
+    AND valid_from <= NEW.date
+    AND valid_to >= NEW.date;
+
+    IF (total_allocated_capacity + NEW.allocated_capacity) > available_capacity THEN
+        RAISE EXCEPTION 'Allocated capacity exceeds the available capacity';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER trg_check_allocation_within_capacity_insert ON public.parking_lot_allocation;
+DROP TRIGGER trg_check_allocation_within_capacity_update ON public.parking_lot_allocation;
+
+CREATE TRIGGER trg_check_allocation_within_capacity_row
+BEFORE INSERT OR UPDATE ON public.parking_lot_allocation
+FOR EACH ROW EXECUTE FUNCTION benchmark_check_allocation_within_capacity_row();
+"""
+
+INSERT_ROWS = """
+INSERT INTO public.parking_lot_allocation (
+    event_id, parking_lot_id, date, allocated_cars, allocated_trucks, allocated_buses
+)
+SELECT :event_id, parking_lot_id, date, 0, 0, 0
+FROM unnest(CAST(:parking_lot_ids AS integer[]), CAST(:dates AS date[])) AS r(parking_lot_id, date)
+"""
+
+
+def build_rows(connection, row_count):
+    event = connection.execute(
+        text(
+            """
+            SELECT id, assembly_start_date, disassembly_end_date
+            FROM public.event
+            ORDER BY disassembly_end_date - assembly_start_date DESC
+            LIMIT 1
+            """
+        )
+    ).mappings().first()
+    lot_ids = connection.execute(
+        text("SELECT id FROM public.parking_lot ORDER BY id")
+    ).scalars().all()
+    if event is None or not lot_ids:
+        raise RuntimeError("Benchmark needs at least one event and one parking lot")
+
+    days = (event["disassembly_end_date"] - event["assembly_start_date"]).days + 1
+    parking_lot_ids = []
+    dates = []
+    for i in range(row_count):
+        parking_lot_ids.append(lot_ids[i % len(lot_ids)])
+        dates.append(event["assembly_start_date"] + timedelta(days=(i // len(lot_ids)) % days))
+    return {"event_id": event["id"], "parking_lot_ids": parking_lot_ids, "dates": dates}
+
+
+def timed_insert(connection, params):
+    start = time.perf_counter()
+    connection.execute(text(INSERT_ROWS), params)
+    return time.perf_counter() - start
+
+
+def run_benchmark(row_count):
+    app = create_app()
+    with app.app_context(), db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            params = build_rows(connection, row_count)
+
+            savepoint = connection.begin_nested()
+            statement_level = timed_insert(connection, params)
+            savepoint.rollback()
+
+            connection.execute(text(ROW_LEVEL_TRIGGER))
+            row_level = timed_insert(connection, params)
+        finally:
+            transaction.rollback()
+
+    print(f"Inserted {row_count} allocation rows (rolled back)")
+    print(f"{'row-level trigger':<28}{row_level * 1000:>10.1f} ms")
+    print(f"{'statement-level trigger':<28}{statement_level * 1000:>10.1f} ms")
+    print(f"{'speedup':<28}{row_level / statement_level:>10.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
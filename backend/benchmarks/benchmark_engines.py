@@ -0,0 +1,123 @@
+"""
+Compare the greedy and the min-cost-flow recommendation engines on every event in the database.
+
+For each event phase both engines get the same parking lots and the same capacity ledger, and the script reports
+total walking distance (vehicles x average lot distance), unmet demand in vehicles and solve time.
+The greedy engine runs all of recommend_phase (high service level lots for cars, lot 5 for trucks, then every
+lot), the flow engine models the same preferences as edge costs.
+
+Usage (from the backend directory, DATABASE_URL set):
+    python -m benchmarks.benchmark_engines
+"""
+
+import time
+
+from app import create_app
+from routes.allocation import fetch_all_events
+from routes.recommendation import (
+    VEHICLE_UNITS,
+    assign_parking_flow,
+    get_parking_lots,
+    recommend_phase,
+)
+from utils.capacity import CapacityLedger
+from utils.distances import get_distance_matrix
+from utils.helpers import get_data_version
+
+PHASES = ["assembly", "runtime", "disassembly"]
+
+
+def walking_distance(assigned_lots, hall_ids):
+    distance_matrix = get_distance_matrix()
+    total = 0.0
+    for vehicle, items in assigned_lots.items():
+        for item in items:
+            distance = distance_matrix.average_distance(hall_ids, item["parking_lot_id"])
+            if distance != float("inf"):
+                total += item["capacity"] / VEHICLE_UNITS[vehicle] * distance
+    return total
+
+
+def assign_greedy(
+    lots, car_demand, bus_demand, truck_demand, phase, start_date, end_date, hall_ids, event_id, ledger
+):
+    """recommend_phase with the signature of assign_parking_flow; unmet demand is derived from the result."""
+    recommendations = recommend_phase(
+        event_id,
+        hall_ids,
+        phase,
+        start_date,
+        end_date,
+        car_demand,
+        bus_demand,
+        truck_demand,
+        ledger,
+        get_data_version("lots")[0],
+    )
+    if isinstance(recommendations, str):
+        raise RuntimeError(recommendations)
+    assigned_lots = {vehicle: recommendations[vehicle] for vehicle in VEHICLE_UNITS}
+    demand = {"cars": car_demand, "buses": bus_demand, "trucks": truck_demand}
+    remaining_demand = {
+        vehicle: demand[vehicle]
+        - sum(item["capacity"] for item in items) // VEHICLE_UNITS[vehicle]
+        for vehicle, items in assigned_lots.items()
+    }
+    return assigned_lots, remaining_demand
+
+
+ENGINES = {"greedy": assign_greedy, "flow": assign_parking_flow}
+
+
+def run_benchmark():
+    events = fetch_all_events()
+    lots = get_parking_lots()
+    ledger = CapacityLedger.load(
+        min(event["assembly_start_date"] for event in events),
+        max(event["disassembly_end_date"] for event in events),
+    )
+    results = {
+        engine: {"walking_distance": 0.0, "unmet_vehicles": 0, "seconds": 0.0}
+        for engine in ENGINES
+    }
+
+    for event in events:
+        for phase in PHASES:
+            demand = [
+                int(event[f"{phase}_demand_cars"]),
+                int(event[f"{phase}_demand_buses"]),
+                int(event[f"{phase}_demand_trucks"]),
+            ]
+            if not any(demand):
+                continue
+            for engine, assign in ENGINES.items():
+                started = time.perf_counter()
+                assigned_lots, remaining_demand = assign(
+                    lots,
+                    *demand,
+                    phase,
+                    event[f"{phase}_start_date"],
+                    event[f"{phase}_end_date"],
+                    event["hall_ids"],
+                    event["id"],
+                    ledger,
+                )
+                results[engine]["seconds"] += time.perf_counter() - started
+                results[engine]["walking_distance"] += walking_distance(
+                    assigned_lots, event["hall_ids"]
+                )
+                results[engine]["unmet_vehicles"] += sum(remaining_demand.values())
+
+    print(f"{len(events)} events")
+    print(f"{'engine':<10}{'walking distance':>20}{'unmet vehicles':>18}{'solve time (s)':>18}")
+    for engine, result in results.items():
+        print(
+            f"{engine:<10}{result['walking_distance']:>20.0f}"
+            f"{result['unmet_vehicles']:>18}{result['seconds']:>18.3f}"
+        )
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        run_benchmark()
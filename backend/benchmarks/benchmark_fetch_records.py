@@ -0,0 +1,71 @@
+"""
+Per-request latency of read endpoints with the pandas path (get_data(...).to_dict) versus fetch_records.
+
+The "pandas" run temporarily points the routes' fetch_records at a get_data based equivalent,
+so both runs execute the same queries and the same view code.
+
+Usage (from the backend directory, DATABASE_URL set):
+    python -m benchmarks.benchmark_fetch_records [repetitions]
+"""
+
+import statistics
+import sys
+import time
+
+import routes.data
+import routes.events
+import routes.parking
+from app import create_app
+from utils.helpers import fetch_records, get_data
+
+MODULES = [routes.data, routes.events, routes.parking]
+
+
+def fetch_records_via_pandas(query, params=None):
+    return get_data(query, params).to_dict(orient="records")
+
+
+def time_requests(client, url, repetitions):
+    client.get(url)  # warm up connection pool and caches
+    timings = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{url} failed: {response.get_data(as_text=True)}")
+    return statistics.median(timings)
+
+
+def run_benchmark(repetitions):
+    app = create_app()
+    with app.app_context():
+        event_ids = fetch_records("SELECT id FROM public.event ORDER BY id LIMIT 1")
+        event_id = event_ids[0]["id"] if event_ids else 1
+    urls = ["/parking/spaces", f"/events/event/{event_id}", "/data/search?q=a"]
+
+    client = app.test_client()
+    results = {}
+    for label, implementation in [
+        ("pandas", fetch_records_via_pandas),
+        ("fetch_records", fetch_records),
+    ]:
+        for module in MODULES:
+            module.fetch_records = implementation
+        try:
+            for url in urls:
+                results[(url, label)] = time_requests(client, url, repetitions)
+        finally:
+            for module in MODULES:
+                module.fetch_records = fetch_records
+
+    print(f"{'endpoint':<28}{'pandas ms':>12}{'records ms':>12}{'speedup':>10}")
+    for url in urls:
+        before = results[(url, "pandas")]
+        after = results[(url, "fetch_records")]
+        print(f"{url:<28}{before:>12.2f}{after:>12.2f}{before / after:>9.1f}x")
+    print(f"(median of {repetitions} requests each)")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,43 @@
+"""
+Batch allocation of all events sequentially and with a pool of worker processes, compared for
+wall time and for identical results. Nothing is written to the database.
+
+Usage (from the backend directory, DATABASE_URL set):
+    python -m benchmarks.benchmark_parallel_allocation [workers]
+"""
+
+import os
+import sys
+
+from app import create_app
+from routes.allocation import compute_batch_allocations
+
+
+def allocation_key(allocation):
+    return (
+        allocation["event_id"],
+        allocation["parking_lot_id"],
+        str(allocation["date"]),
+        int(allocation["allocated_cars"]),
+        int(allocation["allocated_trucks"]),
+        int(allocation["allocated_buses"]),
+    )
+
+
+def run_benchmark(workers):
+    app = create_app()
+    with app.app_context():
+        sequential, sequential_timings = compute_batch_allocations(workers=1)
+        parallel, parallel_timings = compute_batch_allocations(workers=workers)
+
+    identical = [allocation_key(a) for a in sequential] == [allocation_key(a) for a in parallel]
+    print(f"{len(sequential)} allocation rows, identical results: {identical}")
+    print(f"{'sequential':<24}{sequential_timings['total'] * 1000:>10.1f} ms")
+    print(f"{f'{workers} workers':<24}{parallel_timings['total'] * 1000:>10.1f} ms")
+    print(f"{'speedup':<24}{sequential_timings['total'] / parallel_timings['total']:>10.1f}x")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1)
@@ -0,0 +1,74 @@
+"""
+EXPLAIN the parking_lot_capacity validity lookups and check that they scan one of the GiST indexes on
+the validity range instead of the whole table.
+
+Sequential scans are disabled for the check (SET LOCAL enable_seqscan = off) because on small tables
+the planner prefers them regardless; what is checked is that an index can serve the lookup at all.
+Exits with status 1 when a lookup does not use a validity index.
+
+Usage (from the backend directory, DATABASE_URL set):
+    python -m benchmarks.check_capacity_index_usage
+"""
+
+import sys
+from datetime import date
+
+from app import create_app
+from extensions import db
+from sqlalchemy import text
+
+VALIDITY_INDEXES = {"idx_parking_lot_capacity_validity", "parking_lot_capacity_no_overlap"}
+
+LOOKUPS = {
+    "containment per lot and date": (
+        """
+        SELECT SUM(capacity) FROM public.parking_lot_capacity
+        WHERE parking_lot_id = :parking_lot_id AND validity @> CAST(:day AS date)
+        """,
+        {"parking_lot_id": 1, "day": date.today()},
+    ),
+    "overlap with a date window": (
+        """
+        SELECT parking_lot_id, valid_from, valid_to, capacity
+        FROM public.parking_lot_capacity
+        WHERE validity && daterange(CAST(:start_date AS date), CAST(:end_date AS date), '[]')
+        """,
+        {"start_date": date(date.today().year, 1, 1), "end_date": date(date.today().year, 12, 31)},
+    ),
+}
+
+
+def capacity_scans(plan):
+    """Yield (node type, index name) for every plan node that reads parking_lot_capacity."""
+    if plan.get("Relation Name") == "parking_lot_capacity":
+        yield plan["Node Type"], plan.get("Index Name")
+    for child in plan.get("Plans", []):
+        if child.get("Node Type") == "Bitmap Index Scan" and plan.get("Relation Name") == "parking_lot_capacity":
+            yield child["Node Type"], child.get("Index Name")
+        yield from capacity_scans(child)
+
+
+def run_check():
+    app = create_app()
+    failures = 0
+    with app.app_context(), db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+            for label, (query, params) in LOOKUPS.items():
+                plan = connection.execute(
+                    text(f"EXPLAIN (FORMAT JSON) {query}"), params
+                ).scalar()[0]["Plan"]
+                scans = list(capacity_scans(plan))
+                used = sorted({index for _, index in scans if index in VALIDITY_INDEXES})
+                ok = bool(used) and all(node != "Seq Scan" for node, _ in scans)
+                failures += not ok
+                nodes = ", ".join(f"{node} ({index})" if index else node for node, index in scans)
+                print(f"{'ok' if ok else 'FAIL':<6}{label:<32}{nodes}")
+        finally:
+            transaction.rollback()
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run_check() else 0)
@@ -1,10 +1,28 @@
 import os
 from dotenv import load_dotenv
+from utils.db_metrics import InstrumentedQueuePool
 
 load_dotenv()
 
+
+def _engine_options():
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # Recycle before managed Postgres / load balancers drop idle connections
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    if os.getenv("DB_SSLMODE"):
+        options["connect_args"] = {"sslmode": os.getenv("DB_SSLMODE")}
+    return options
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options()
 
 print(f"DATABASE_URL: {os.getenv('DATABASE_URL')}")
@@ -1,10 +1,16 @@
 import pandas as pd
 from sqlalchemy import text
 from datetime import datetime
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from extensions import db
-from utils.helpers import get_data
+from utils.capacity import CapacityLedger, to_date
+from utils.distances import get_distance_matrix, set_distance_matrix
+from utils.helpers import fetch_records, get_data_version
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import wraps
 from routes.auth import check_edit_rights
 
@@ -31,7 +37,7 @@ def fetch_remaining_event_ids():
         ) pa ON v.event_id = pa.event_id AND v.date = pa.date
         WHERE v.demand != COALESCE(pa.total_allocated_capacity, 0);
     """
-    remaining_events = get_data(query).to_dict(orient="records")
+    remaining_events = fetch_records(query)
     return [event["event_id"] for event in remaining_events]
 
 
@@ -56,14 +62,14 @@ def fetch_all_events(event_ids=None):
         FROM event e
         {event_condition}
     """
-    events = get_data(query).to_dict(orient="records")
+    events = fetch_records(query)
     return events
 
 
-def generate_recommendations(event_data):
+def generate_recommendations(event_data, ledger=None, lots_version=None):
     from routes.recommendation import recommendation_engine, adjust_recommendations
 
-    recommendations = recommendation_engine(event_data)
+    recommendations = recommendation_engine(event_data, ledger, lots_version=lots_version)
     recommendations_adjusted = adjust_recommendations(recommendations)
     return recommendations_adjusted
 
@@ -74,12 +80,32 @@ def fetch_daily_demands(event_id, start_date, end_date, phase):
         FROM visitor_demand
         WHERE event_id = {event_id} AND status = '{phase}' AND date BETWEEN '{start_date}' AND '{end_date}'
     """
-    demands = get_data(query).to_dict(orient="records")
+    demands = fetch_records(query)
     return {d["date"].strftime("%Y-%m-%d"): d for d in demands}
 
 
-def apply_recommendations(event_data, recommendations):
+def fetch_all_daily_demands(event_ids=None):
+    if event_ids:
+        event_condition = f"WHERE event_id IN ({', '.join(map(str, event_ids))})"
+    else:
+        event_condition = ""
+
+    query = f"""
+        SELECT event_id, date, status, car_demand, bus_demand, truck_demand
+        FROM visitor_demand
+        {event_condition}
+    """
+    demands = {}
+    for d in fetch_records(query):
+        demands.setdefault(d["event_id"], {}).setdefault(d["status"], {})[
+            d["date"].strftime("%Y-%m-%d")
+        ] = d
+    return demands
+
+
+def apply_recommendations(event_data, recommendations, daily_demands_by_phase=None):
     allocations = []
+    allocations_by_key = {}
     total_demands = {}
 
     def add_allocation(date, vehicle_type, demand, capacities):
@@ -88,14 +114,8 @@ def apply_recommendations(event_data, recommendations):
             if remaining_demand <= 0:
                 break
 
-            allocation = next(
-                (
-                    a
-                    for a in allocations
-                    if a["parking_lot_id"] == item["parking_lot_id"]
-                    and a["date"] == date.strftime("%Y-%m-%d")
-                ),
-                None,
+            allocation = allocations_by_key.get(
+                (item["parking_lot_id"], date.strftime("%Y-%m-%d"))
             )
             if not allocation:
                 allocation = {
@@ -107,6 +127,9 @@ def apply_recommendations(event_data, recommendations):
                     "allocated_buses": 0,
                 }
                 allocations.append(allocation)
+                allocations_by_key[(item["parking_lot_id"], allocation["date"])] = (
+                    allocation
+                )
 
             available_capacity = item["capacity"]
             if vehicle_type == "cars":
@@ -144,12 +167,15 @@ def apply_recommendations(event_data, recommendations):
     }
 
     for phase in ["assembly", "runtime", "disassembly"]:
-        daily_demands = fetch_daily_demands(
-            event_data["id"],
-            phase_dates[phase]["start_date"],
-            phase_dates[phase]["end_date"],
-            phase,
-        )
+        if daily_demands_by_phase is not None:
+            daily_demands = daily_demands_by_phase.get(phase, {})
+        else:
+            daily_demands = fetch_daily_demands(
+                event_data["id"],
+                phase_dates[phase]["start_date"],
+                phase_dates[phase]["end_date"],
+                phase,
+            )
         for date in pd.date_range(
             phase_dates[phase]["start_date"], phase_dates[phase]["end_date"]
         ):
@@ -177,6 +203,41 @@ def apply_recommendations(event_data, recommendations):
     return allocations, total_demands
 
 
+def insert_allocations(allocations):
+    """
+    Write allocation rows with one INSERT over unnest'ed arrays, so the statement-level
+    capacity trigger validates them in a single pass.
+    """
+    if not allocations:
+        return
+    db.session.execute(
+        text(
+            """
+            INSERT INTO public.parking_lot_allocation (
+                event_id, parking_lot_id, date, allocated_cars, allocated_trucks, allocated_buses
+            )
+            SELECT *
+            FROM unnest(
+                CAST(:event_ids AS integer[]),
+                CAST(:parking_lot_ids AS integer[]),
+                CAST(:dates AS date[]),
+                CAST(:cars AS integer[]),
+                CAST(:trucks AS integer[]),
+                CAST(:buses AS integer[])
+            )
+            """
+        ),
+        {
+            "event_ids": [int(a["event_id"]) for a in allocations],
+            "parking_lot_ids": [int(a["parking_lot_id"]) for a in allocations],
+            "dates": [str(a["date"]) for a in allocations],
+            "cars": [int(a["allocated_cars"]) for a in allocations],
+            "trucks": [int(a["allocated_trucks"]) for a in allocations],
+            "buses": [int(a["allocated_buses"]) for a in allocations],
+        },
+    )
+
+
 def save_allocations_to_db(allocations, current_event, total_events):
     try:
         if allocations:
@@ -188,31 +249,394 @@ def save_allocations_to_db(allocations, current_event, total_events):
             )
             db.session.execute(delete_query, {"event_id": allocations[0]["event_id"]})
 
-        for allocation in allocations:
-            allocation["allocated_cars"] = int(allocation["allocated_cars"])
-            allocation["allocated_trucks"] = int(allocation["allocated_trucks"])
-            allocation["allocated_buses"] = int(allocation["allocated_buses"])
+        insert_allocations(allocations)
 
-            insert_query = text(
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving allocations: {e}")
+
+
+def save_batch_allocations_to_db(allocations):
+    if not allocations:
+        return
+    event_ids = sorted({allocation["event_id"] for allocation in allocations})
+    try:
+        db.session.execute(
+            text(
                 """
-                INSERT INTO public.parking_lot_allocation (
-                    event_id, parking_lot_id, date, allocated_cars, allocated_trucks, allocated_buses
-                ) VALUES (
-                    :event_id, :parking_lot_id, :date, :allocated_cars, :allocated_trucks, :allocated_buses
-                )
-                ON CONFLICT (event_id, parking_lot_id, date) 
-                DO UPDATE SET 
-                    allocated_cars = EXCLUDED.allocated_cars,
-                    allocated_trucks = EXCLUDED.allocated_trucks,
-                    allocated_buses = EXCLUDED.allocated_buses
+                DELETE FROM public.parking_lot_allocation
+                WHERE event_id IN :event_ids
                 """
+            ),
+            {"event_ids": tuple(event_ids)},
+        )
+        insert_allocations(allocations)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def allocate_events(events, demands, ledger, lots_version, timings):
+    """
+    Recommend and apply events in the given order. Each event's allocations are booked into the ledger
+    before the next event is recommended. Adds the seconds spent to timings["recommend"] and timings["apply"].
+    """
+    all_allocations = []
+    for event in events:
+        step = time.perf_counter()
+        recommendations = generate_recommendations(event, ledger, lots_version)
+        timings["recommend"] += time.perf_counter() - step
+
+        step = time.perf_counter()
+        allocations, _ = apply_recommendations(
+            event, recommendations, demands.get(event["id"], {})
+        )
+        if allocations:
+            ledger.release(event["id"])
+            for allocation in allocations:
+                ledger.allocate(
+                    event["id"],
+                    allocation["parking_lot_id"],
+                    allocation["date"],
+                    cars=int(allocation["allocated_cars"]),
+                    trucks=int(allocation["allocated_trucks"]),
+                    buses=int(allocation["allocated_buses"]),
+                )
+            all_allocations.extend(allocations)
+        else:
+            logger.warning(f"No allocations generated for event {event['id']}")
+        timings["apply"] += time.perf_counter() - step
+    return all_allocations
+
+
+def partition_events(events, ledger):
+    """
+    Split events sorted by (assembly_start_date, id) into groups whose days overlap transitively.
+    An event's days run from assembly start to disassembly end, widened by any allocations it already
+    has in the ledger (they are released when the event is applied). Groups never share a day,
+    so they read and book disjoint ledger cells. Each group is a contiguous run of the sorted events.
+    """
+    groups = []
+    spans = []
+    for event in events:
+        first = event["assembly_start_date"]
+        last = event["disassembly_end_date"]
+        day_indexes = [day for _, day in ledger.event_cells.get(event["id"], {})]
+        if day_indexes:
+            first = min(first, ledger.date_of(min(day_indexes)))
+            last = max(last, ledger.date_of(max(day_indexes)))
+        group = [event]
+        # Old allocations can reach back past the previous group, so merge every group the event touches
+        while spans and first <= spans[-1][1]:
+            group_first, group_last = spans.pop()
+            group = groups.pop() + group
+            first = min(first, group_first)
+            last = max(last, group_last)
+        groups.append(group)
+        spans.append((first, last))
+    return groups
+
+
+def warm_recommendation_caches(events, lots_version):
+    """
+    Load everything recommendation_engine reads from the database.
+    Returns (distance matrix, {ranked lots cache key: ranked lots}) for the worker processes.
+    """
+    from routes.recommendation import get_ranked_lots
+
+    distance_matrix = get_distance_matrix(lots_version)
+    ranked_lots = {}
+    for hall_ids in {frozenset(event["hall_ids"]) for event in events}:
+        for service_level in (None, "high"):
+            lots = get_ranked_lots(hall_ids, service_level=service_level, version=lots_version)
+            if isinstance(lots, str):
+                raise RuntimeError(lots)
+            ranked_lots[(hall_ids, service_level, None, lots_version)] = lots
+    return distance_matrix, ranked_lots
+
+
+# Inputs of a parallel run inside a worker process, passed in by _init_allocation_worker
+_parallel_run = {}
+
+
+def _init_allocation_worker(run):
+    # Workers are spawned, so they start without the parent's caches and never touch the database
+    from routes.recommendation import ranked_lots_cache
+
+    set_distance_matrix(run.pop("distance_matrix"), run["lots_version"])
+    for key, lots in run.pop("ranked_lots").items():
+        ranked_lots_cache.set(key, lots)
+    _parallel_run.update(run)
+
+
+def _allocate_group(group_index):
+    timings = {"recommend": 0.0, "apply": 0.0}
+    allocations = allocate_events(
+        _parallel_run["groups"][group_index],
+        _parallel_run["demands"],
+        _parallel_run["ledger"],
+        _parallel_run["lots_version"],
+        timings,
+    )
+    return allocations, timings
+
+
+def allocate_groups_in_pool(
+    groups, demands, ledger, lots_version, distance_matrix, ranked_lots, workers, timings
+):
+    """
+    Allocate each group in a spawned worker process against its copy of the ledger.
+    The workers receive the ledger, demands, distance matrix and ranked lots up front, since
+    forking a threaded server process could copy locks held by other threads.
+    Results are concatenated in group order, which is the order of the sequential run.
+    """
+    run = {
+        "groups": groups,
+        "demands": demands,
+        "ledger": ledger,
+        "lots_version": lots_version,
+        "distance_matrix": distance_matrix,
+        "ranked_lots": ranked_lots,
+    }
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(groups)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_allocation_worker,
+        initargs=(run,),
+    ) as pool:
+        results = list(pool.map(_allocate_group, range(len(groups))))
+
+    all_allocations = []
+    for allocations, group_timings in results:
+        all_allocations.extend(allocations)
+        for phase, seconds in group_timings.items():
+            timings[phase] += seconds
+    return all_allocations
+
+
+def compute_batch_allocations(event_ids=None, workers=1):
+    """
+    Allocate all events against one shared CapacityLedger without writing anything.
+    Demand and capacity are read once, and events are processed by assembly start date (then id).
+    With workers > 1, events are partitioned into groups that share no day.
+    The groups run in a pool of spawned processes. The result is identical to the sequential run.
+    Falls back to the sequential run when there is a single group or the pool breaks.
+    Returns (allocations, timings) where timings holds the seconds spent per phase.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    events = fetch_all_events(event_ids)
+    events.sort(key=lambda event: (event["assembly_start_date"], event["id"]))
+    timings["load_events"] = time.perf_counter() - started
+    if not events:
+        return [], timings
+
+    step = time.perf_counter()
+    demands = fetch_all_daily_demands([event["id"] for event in events])
+    timings["load_demands"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    ledger = CapacityLedger.load(
+        min(event["assembly_start_date"] for event in events),
+        max(event["disassembly_end_date"] for event in events),
+    )
+    lots_version = get_data_version("lots")[0]
+    timings["load_capacity"] = time.perf_counter() - step
+
+    timings["recommend"] = 0.0
+    timings["apply"] = 0.0
+    groups = partition_events(events, ledger) if workers > 1 else [events]
+    if len(groups) > 1:
+        step = time.perf_counter()
+        distance_matrix, ranked_lots = warm_recommendation_caches(events, lots_version)
+        timings["warm_caches"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        try:
+            all_allocations = allocate_groups_in_pool(
+                groups,
+                demands,
+                ledger,
+                lots_version,
+                distance_matrix,
+                ranked_lots,
+                workers,
+                timings,
             )
-            db.session.execute(insert_query, allocation)
+        except BrokenProcessPool as e:
+            logger.warning(f"Allocation worker pool failed ({e}), allocating sequentially")
+            timings["recommend"] = 0.0
+            timings["apply"] = 0.0
+            all_allocations = allocate_events(events, demands, ledger, lots_version, timings)
+        timings["parallel"] = time.perf_counter() - step
+    else:
+        all_allocations = allocate_events(events, demands, ledger, lots_version, timings)
+
+    timings["total"] = time.perf_counter() - started
+    return all_allocations, timings
 
+
+def run_batch_allocation(event_ids=None, workers=1):
+    """
+    compute_batch_allocations, then write all allocations in a single transaction.
+    Returns (allocations, timings) where timings holds the seconds spent per phase.
+    """
+    started = time.perf_counter()
+    all_allocations, timings = compute_batch_allocations(event_ids, workers)
+
+    step = time.perf_counter()
+    save_batch_allocations_to_db(all_allocations)
+    timings["write"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - started
+    return all_allocations, timings
+
+
+def allocate_event_day(event_id, day, demand, hall_ids, lots_version, ledger):
+    from routes.recommendation import recommend_phase
+
+    assigned_lots = recommend_phase(
+        event_id,
+        hall_ids,
+        demand["status"],
+        day,
+        day,
+        int(demand["car_demand"]),
+        int(demand["bus_demand"]),
+        int(demand["truck_demand"]),
+        ledger,
+        lots_version,
+    )
+    if isinstance(assigned_lots, str):
+        raise RuntimeError(assigned_lots)
+    rows = {}
+    for vehicle, column, units in [
+        ("cars", "allocated_cars", 1),
+        ("buses", "allocated_buses", 3),
+        ("trucks", "allocated_trucks", 4),
+    ]:
+        for item in assigned_lots[vehicle]:
+            row = rows.setdefault(
+                item["parking_lot_id"],
+                {
+                    "event_id": event_id,
+                    "parking_lot_id": item["parking_lot_id"],
+                    "date": day.strftime("%Y-%m-%d"),
+                    "allocated_cars": 0,
+                    "allocated_trucks": 0,
+                    "allocated_buses": 0,
+                },
+            )
+            row[column] += int(item["capacity"]) // units
+
+    ledger.release(event_id, day, day)
+    for row in rows.values():
+        ledger.allocate(
+            event_id,
+            row["parking_lot_id"],
+            day,
+            cars=row["allocated_cars"],
+            trucks=row["allocated_trucks"],
+            buses=row["allocated_buses"],
+        )
+    return list(rows.values())
+
+
+def reallocate_event_days(event_id, dates):
+    """
+    Re-allocate only the given days of one event against the allocations of all other events.
+    Afterwards, other events with open demand on those days that share a parking lot with the event,
+    or have no allocation on the day yet, are topped up from the capacity that became free.
+    Returns the (event_id, date) cells that were rewritten.
+    """
+    days = sorted({to_date(day) for day in dates})
+    if not days:
+        return []
+
+    ledger = CapacityLedger.load(days[0], days[-1])
+    lots_version = get_data_version("lots")[0]
+
+    demand_query = text(
+        """
+        SELECT vd.event_id, vd.date, vd.car_demand, vd.bus_demand, vd.truck_demand, vd.demand, vd.status,
+               ARRAY(SELECT DISTINCT hall_id FROM hall_occupation WHERE event_id = vd.event_id) AS hall_ids
+        FROM public.visitor_demand vd
+        WHERE vd.date IN :dates
+        """
+    )
+    demands = {}
+    hall_ids = {}
+    for row in db.session.execute(demand_query, {"dates": tuple(days)}).mappings():
+        demands[(row["event_id"], row["date"])] = row
+        hall_ids[row["event_id"]] = row["hall_ids"]
+
+    def lots_on(event, day):
+        day_index = (day - ledger.start_date).days
+        return {
+            lot
+            for (lot, index), cell in ledger.event_cells.get(event, {}).items()
+            if index == day_index and cell[0] > 0
+        }
+
+    cells = []
+    allocations = []
+    for day in days:
+        touched_lots = lots_on(event_id, day)
+        demand = demands.get((event_id, day))
+        if demand is not None and demand["demand"] > 0:
+            allocations.extend(
+                allocate_event_day(
+                    event_id, day, demand, hall_ids[event_id], lots_version, ledger
+                )
+            )
+        else:
+            ledger.release(event_id, day, day)
+        cells.append((event_id, day))
+        touched_lots |= lots_on(event_id, day)
+
+        day_index = (day - ledger.start_date).days
+        for (neighbor_id, neighbor_day), neighbor_demand in sorted(demands.items()):
+            if neighbor_id == event_id or neighbor_day != day:
+                continue
+            neighbor_lots = lots_on(neighbor_id, day)
+            allocated = sum(
+                ledger.event_cells[neighbor_id][(lot, day_index)][0]
+                for lot in neighbor_lots
+            )
+            if allocated >= neighbor_demand["demand"]:
+                continue
+            # A neighbor without any allocation on the day can use any lot that became free
+            if neighbor_lots and not (neighbor_lots & touched_lots):
+                continue
+            allocations.extend(
+                allocate_event_day(
+                    neighbor_id, day, neighbor_demand, hall_ids[neighbor_id], lots_version, ledger
+                )
+            )
+            cells.append((neighbor_id, day))
+
+    try:
+        db.session.execute(
+            text(
+                """
+                DELETE FROM public.parking_lot_allocation pa
+                USING unnest(CAST(:event_ids AS integer[]), CAST(:dates AS date[])) AS c(event_id, date)
+                WHERE pa.event_id = c.event_id AND pa.date = c.date
+                """
+            ),
+            {
+                "event_ids": [cell[0] for cell in cells],
+                "dates": [cell[1] for cell in cells],
+            },
+        )
+        insert_allocations(allocations)
         db.session.commit()
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        logger.error(f"Error saving allocations: {e}")
+        raise
+    return cells
 
 
 def log_allocation_dataframe(event_data, allocations, total_demands):
@@ -253,3 +677,64 @@ def allocate_parking_spaces():
     except Exception as e:
         logger.error(f"Error running allocation: {e}")
         return jsonify({"error": str(e)}), 500
+
+
+@allocation_bp.route("/allocate_batch", methods=["POST"])
+def allocate_parking_spaces_batch():
+    try:
+        if specific_event_ids:
+            event_ids = specific_event_ids
+        elif run_all_allocations:
+            event_ids = None
+        else:
+            event_ids = fetch_remaining_event_ids()
+
+        data = request.get_json(silent=True) or {}
+        workers = int(data.get("workers", 1))
+        if workers < 1:
+            return jsonify({"error": "workers must be at least 1"}), 400
+
+        allocations, timings = run_batch_allocation(event_ids, workers)
+        timings = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+        logger.info(f"Batch allocation timings (s): {timings}")
+        return (
+            jsonify(
+                {
+                    "message": "Batch allocation process completed successfully",
+                    "allocations": len(allocations),
+                    "timings": timings,
+                }
+            ),
+            200,
+        )
+    except Exception as e:
+        logger.error(f"Error running batch allocation: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@allocation_bp.route("/reallocate", methods=["POST"])
+@check_edit_rights
+def reallocate_parking_spaces():
+    try:
+        data = request.json
+        event_id = data.get("event_id")
+        dates = data.get("dates", [])
+        if not event_id or not dates:
+            return jsonify({"error": "Event ID and dates must be provided"}), 400
+
+        cells = reallocate_event_days(event_id, dates)
+        return (
+            jsonify(
+                {
+                    "message": "Reallocation completed successfully",
+                    "reallocated": [
+                        {"event_id": cell_event_id, "date": day.strftime("%Y-%m-%d")}
+                        for cell_event_id, day in cells
+                    ],
+                }
+            ),
+            200,
+        )
+    except Exception as e:
+        logger.error(f"Error running reallocation: {e}")
+        return jsonify({"error": str(e)}), 500
@@ -7,7 +7,7 @@ import jwt
 from extensions import db
 from flask import Blueprint, jsonify, request
 from models import User
-from utils.helpers import log_user_activity
+from utils.activity_log import log_user_activity
 from werkzeug.security import check_password_hash, generate_password_hash
 
 auth_bp = Blueprint("auth", __name__)
@@ -244,6 +244,10 @@ def log_activity():
         logger.error("Email is missing")
         return jsonify({"message": "Email is missing"}), 400
 
+    if not all([user_name, ip_address, session_id, page_accessed]):
+        logger.error("User log entry is missing required fields")
+        return jsonify({"message": "Missing required fields"}), 400
+
     try:
         log_user_activity(user_name, email, ip_address, session_id, page_accessed)
         return jsonify({"message": "Activity logged"}), 200
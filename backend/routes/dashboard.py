@@ -3,7 +3,8 @@ from datetime import datetime, timedelta
 
 from flask import Blueprint, jsonify, request
 from sqlalchemy import text
-from utils.helpers import get_data
+from utils.capacity import capacity_timeseries
+from utils.helpers import fetch_records
 
 dashboard_bp = Blueprint("dashboard", __name__)
 logger = logging.getLogger(__name__)
@@ -16,91 +17,109 @@ def get_capacity_utilization():
         start_date = request.args.get("start_date", default=f"{year}-01-01", type=str)
         end_date = request.args.get("end_date", default=f"{year}-12-31", type=str)
 
-        query_total_capacity_utilization = f"""
-        SELECT date, total_demand, COALESCE(total_capacity, 1) AS total_capacity
-        FROM view_schema.view_demand_vs_capacity
-        WHERE date BETWEEN '{start_date}' AND '{end_date}'
-        ORDER BY date;
-        """
-        total_capacity_utilization = get_data(query_total_capacity_utilization)
-
-        query_events_per_day = f"""
-        SELECT vd.date, vd.event_id, vd.demand AS capacity, e.name AS event_name, e.color AS event_color
-        FROM public.visitor_demand vd
-        JOIN public.event e ON vd.event_id = e.id
-        ORDER BY vd.date, vd.event_id;
+        # Events per day are aggregated in SQL for the requested window only, one row per date
+        query = """
+        WITH events_per_day AS (
+            SELECT
+                vd.date,
+                json_agg(
+                    json_build_object(
+                        'event_id', e.id,
+                        'event_name', e.name,
+                        'capacity', vd.capacity,
+                        'event_color', e.color
+                    )
+                    ORDER BY e.id
+                ) AS events
+            FROM (
+                SELECT date, event_id, SUM(demand) AS capacity
+                FROM public.visitor_demand
+                WHERE date BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+                GROUP BY date, event_id
+            ) vd
+            JOIN public.event e ON vd.event_id = e.id
+            GROUP BY vd.date
+        )
+        SELECT
+            to_char(v.date, 'YYYY-MM-DD') AS date,
+            v.total_demand,
+            COALESCE(v.total_capacity, 1) AS total_capacity,
+            COALESCE(epd.events, '[]'::json) AS events
+        FROM view_schema.view_demand_vs_capacity v
+        LEFT JOIN events_per_day epd ON epd.date = v.date
+        WHERE v.date BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+        ORDER BY v.date;
         """
-        events_per_day = get_data(query_events_per_day)
-        events_dict = {}
-        for _, row in events_per_day.iterrows():
-            date = row["date"].strftime("%Y-%m-%d")
-            if date not in events_dict:
-                events_dict[date] = {}
-            if row["event_id"] not in events_dict[date]:
-                events_dict[date][row["event_id"]] = {
-                    "event_id": row["event_id"],
-                    "event_name": row["event_name"],
-                    "capacity": 0,
-                    "event_color": row["event_color"],
-                }
-            events_dict[date][row["event_id"]]["capacity"] += row["capacity"]
-
-        data = []
-        for _, row in total_capacity_utilization.iterrows():
-            date_str = row["date"].strftime("%Y-%m-%d")
-            data.append(
-                {
-                    "date": date_str,
-                    "total_demand": row["total_demand"],
-                    "total_capacity": row["total_capacity"],
-                    "events": list(events_dict.get(date_str, {}).values()),
-                }
-            )
+        data = fetch_records(query, {"start_date": start_date, "end_date": end_date})
 
         return jsonify(data), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+CRITICAL_BUCKETS = ["above_100", "between_80_and_100"]
+
+
+def fetch_critical_days(start_date, end_date):
+    """
+    Days between start_date and end_date whose demand exceeds capacity (above_100) or reaches
+    80 % of it (between_80_and_100), grouped by month. Every month with demand is present,
+    also when it has no critical days.
+    """
+    # Buckets compare demand with capacity directly, which equals the ratio thresholds without dividing by 0
+    query = """
+    WITH classified AS (
+        SELECT
+            date,
+            CASE
+                WHEN total_demand > total_capacity THEN 'above_100'
+                WHEN total_demand >= 0.8 * total_capacity THEN 'between_80_and_100'
+            END AS bucket
+        FROM view_schema.view_demand_vs_capacity
+        WHERE date BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+    )
+    SELECT
+        to_char(date_trunc('month', date), 'YYYY-MM') AS month,
+        COUNT(*) FILTER (WHERE bucket = 'above_100') AS above_100_count,
+        COALESCE(
+            array_agg(to_char(date, 'YYYY-MM-DD') ORDER BY date) FILTER (WHERE bucket = 'above_100'),
+            '{}'
+        ) AS above_100_dates,
+        COUNT(*) FILTER (WHERE bucket = 'between_80_and_100') AS between_80_and_100_count,
+        COALESCE(
+            array_agg(to_char(date, 'YYYY-MM-DD') ORDER BY date) FILTER (WHERE bucket = 'between_80_and_100'),
+            '{}'
+        ) AS between_80_and_100_dates
+    FROM classified
+    GROUP BY date_trunc('month', date)
+    ORDER BY date_trunc('month', date);
+    """
+    rows = fetch_records(query, {"start_date": start_date, "end_date": end_date})
+    return {
+        row["month"]: {
+            bucket: {"count": row[f"{bucket}_count"], "dates": row[f"{bucket}_dates"]}
+            for bucket in CRITICAL_BUCKETS
+        }
+        for row in rows
+    }
+
+
 @dashboard_bp.route("/capacity_utilization_critical_days/<int:year>", methods=["GET"])
 def capacity_utilization_critical_days(year):
     try:
-        start_date = f"{year}-01-01"
-        end_date = f"{year}-12-31"
+        return jsonify(fetch_critical_days(f"{year}-01-01", f"{year}-12-31")), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        query = f"""
-        SELECT date, total_demand, total_capacity
-        FROM view_schema.view_demand_vs_capacity
-        WHERE date BETWEEN '{start_date}' AND '{end_date}'
-        ORDER BY date;
-        """
-        data = get_data(query)
-
-        monthly_data = {}
-
-        for _, row in data.iterrows():
-            date = row["date"]
-            month = date.strftime("%Y-%m")
-            if month not in monthly_data:
-                monthly_data[month] = {
-                    "above_100": {"count": 0, "dates": []},
-                    "between_80_and_100": {"count": 0, "dates": []},
-                }
-
-            demand = row["total_demand"]
-            capacity = row["total_capacity"]
-            if 0.8 * capacity <= demand <= capacity:
-                monthly_data[month]["between_80_and_100"]["count"] += 1
-                monthly_data[month]["between_80_and_100"]["dates"].append(
-                    date.strftime("%Y-%m-%d")
-                )
-            elif demand > capacity:
-                monthly_data[month]["above_100"]["count"] += 1
-                monthly_data[month]["above_100"]["dates"].append(
-                    date.strftime("%Y-%m-%d")
-                )
-
-        return jsonify(monthly_data), 200
+
+@dashboard_bp.route("/capacity_utilization_critical_days", methods=["GET"])
+def capacity_utilization_critical_days_range():
+    try:
+        start_date = request.args.get("from")
+        end_date = request.args.get("to")
+        if not start_date or not end_date:
+            return jsonify({"error": "from and to dates are required"}), 400
+        return jsonify(fetch_critical_days(start_date, end_date)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -114,29 +133,14 @@ def total_capacity():
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
 
-        query = """
-        SELECT id, parking_lot_id, capacity, valid_from, valid_to
-        FROM public.parking_lot_capacity
-        """
-
-        result = get_data(query)
-        capacity_data = result.to_dict(orient="records")
-
-        total_capacities = []
-        current_date = start_date
-        while current_date <= end_date:
-            total_capacity = sum(
-                entry["capacity"]
-                for entry in capacity_data
-                if entry["valid_from"] <= current_date <= entry["valid_to"]
-            )
-            total_capacities.append(
-                {
-                    "day": current_date.strftime("%Y-%m-%d"),
-                    "total_capacity": total_capacity,
-                }
-            )
-            current_date += timedelta(days=1)
+        totals = capacity_timeseries(start_date, end_date)
+        total_capacities = [
+            {
+                "day": (start_date + timedelta(days=offset)).strftime("%Y-%m-%d"),
+                "total_capacity": int(total),
+            }
+            for offset, total in enumerate(totals)
+        ]
 
         return jsonify(total_capacities), 200
     except Exception as e:
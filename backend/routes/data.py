@@ -1,79 +1,283 @@
-from flask import Blueprint, jsonify, request
-from utils.helpers import get_data
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import text
+from extensions import db
+from utils.cache import TTLCache
+from utils.helpers import fetch_records, get_data_version
 from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import json
 import logging
 
 data_bp = Blueprint('data', __name__)
 logger = logging.getLogger(__name__)
 
+EXPORT_COLUMNS = [
+    "event_id",
+    "event",
+    "date",
+    "demand",
+    "status",
+    "halls",
+    "parking_lot",
+    "allocated_capacity",
+    "distance",
+]
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# First result pages of frequent (typeahead) queries, keyed by data version
+search_cache = TTLCache(maxsize=1024, ttl=300)
+
 @data_bp.route("/events_parking_lots_allocation", methods=["GET"])
 def get_events_parking_lots_allocation():
     """
     Endpoint to retrieve parking lot allocations for events.
     Fetches data from the 'view_schema.view_events_parking_lots_allocation' view in the database.
+    For large ranges use /data/export/allocations, which streams the same rows.
 
     Returns:
         JSON response with the fetched data or an error message if an exception is raised.
     """
     try:
         query = """
-        SELECT
-            event_id,
-            event,
-            date,
-            demand,
-            status,
-            STRING_AGG(DISTINCT halls, ', ') AS halls,
-            parking_lot,
-            allocated_capacity,
-            distance
+        SELECT event_id, event, date, demand, status, halls, parking_lot, allocated_capacity, distance
         FROM view_schema.view_events_parking_lots_allocation
-        GROUP BY event_id, event, date, demand, status, parking_lot, allocated_capacity, distance
         ORDER BY event_id, date;
-
         """
-        df_events_parking_lots_allocation = get_data(query)
-        df_events_parking_lots_allocation["id"] = (
-            df_events_parking_lots_allocation.index
-        )  
-        if df_events_parking_lots_allocation.empty:
+        events_parking_lots_allocation = fetch_records(query)
+        if not events_parking_lots_allocation:
             return jsonify({"message": "No data found"}), 204
-        print(df_events_parking_lots_allocation)
-        return jsonify(df_events_parking_lots_allocation.to_dict(orient="records")), 200
+        for index, row in enumerate(events_parking_lots_allocation):
+            row["id"] = index
+        return jsonify(events_parking_lots_allocation), 200
     except Exception as e:
         logger.error("Failed to fetch data from database", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 
+def stream_allocation_chunks(start_date=None, end_date=None):
+    """
+    Rows of view_events_parking_lots_allocation within the optional date window, read through a
+    server-side cursor and yielded as lists of at most EXPORT_CHUNK_SIZE tuples in EXPORT_COLUMNS order.
+    """
+    query = """
+    SELECT
+        event_id,
+        event,
+        to_char(date, 'YYYY-MM-DD') AS date,
+        demand,
+        status,
+        halls,
+        parking_lot,
+        allocated_capacity,
+        distance
+    FROM view_schema.view_events_parking_lots_allocation
+    WHERE (CAST(:start_date AS date) IS NULL OR date >= CAST(:start_date AS date))
+    AND (CAST(:end_date AS date) IS NULL OR date <= CAST(:end_date AS date))
+    ORDER BY event_id, date, parking_lot
+    """
+    params = {"start_date": start_date, "end_date": end_date}
+    with db.engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=EXPORT_CHUNK_SIZE
+        ).execute(text(query), params)
+        for rows in result.partitions():
+            yield [tuple(row) for row in rows]
+
+
+def format_ndjson(chunks):
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows
+        )
+
+
+def format_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@data_bp.route("/export/allocations", methods=["GET"])
+def export_allocations():
+    """
+    Streams parking lot allocations for events as NDJSON (default) or CSV.
+    Optional from/to (YYYY-MM-DD) limit the export to a date window. Rows are read through a
+    server-side cursor and sent in chunks, so memory stays flat however many years are exported.
+
+    Returns:
+        Streaming response with one row per line, or an error message for invalid parameters.
+    """
+    export_format = request.args.get("format", "ndjson").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+
+    try:
+        start_date, end_date = (
+            datetime.strptime(value, "%Y-%m-%d").date() if value else None
+            for value in (request.args.get("from"), request.args.get("to"))
+        )
+    except ValueError:
+        return jsonify({"error": "from and to must be dates in YYYY-MM-DD format"}), 400
+
+    formatter = format_csv if export_format == "csv" else format_ndjson
+    filename = "allocations"
+    if start_date or end_date:
+        filename += f"_{start_date or 'start'}_{end_date or 'end'}"
+    return Response(
+        stream_with_context(formatter(stream_allocation_chunks(start_date, end_date))),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{export_format}"},
+    )
+
+
+def encode_search_cursor(row):
+    payload = json.dumps([row["score"], row["type"], row["id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_search_cursor(cursor):
+    """(score, type, id) of the last row of the previous page; raises ValueError for malformed cursors."""
+    try:
+        score, result_type, result_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), str(result_type), int(result_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_names(query_param, prefix, start_date, end_date, limit, after=None):
+    """
+    One page of events and parking lots whose name contains query_param (or starts with it when prefix),
+    ranked by trigram similarity, then type and id. Events can be limited to those whose assembly to
+    disassembly window overlaps start_date..end_date. Returns (results, next_cursor or None).
+    """
+    search_query = """
+    WITH matches AS (
+        SELECT 'event' AS type, id, name, color, assembly_start_date, disassembly_end_date,
+               similarity(name, :query) AS score
+        FROM public.event
+        WHERE name ILIKE :pattern
+        AND (CAST(:start_date AS date) IS NULL OR disassembly_end_date >= CAST(:start_date AS date))
+        AND (CAST(:end_date AS date) IS NULL OR assembly_start_date <= CAST(:end_date AS date))
+        UNION ALL
+        SELECT 'parking_lot' AS type, id, name, '#6a91ce' AS color, NULL AS assembly_start_date, NULL AS disassembly_end_date,
+               similarity(name, :query) AS score
+        FROM public.parking_lot
+        WHERE name ILIKE :pattern
+    )
+    SELECT type, id, name, color, assembly_start_date, disassembly_end_date, score
+    FROM matches
+    WHERE CAST(:after_score AS real) IS NULL
+    OR score < CAST(:after_score AS real)
+    OR (score = CAST(:after_score AS real) AND (type, id) > (CAST(:after_type AS text), CAST(:after_id AS integer)))
+    ORDER BY score DESC, type, id
+    LIMIT :limit
+    """
+    pattern = escape_like(query_param) + "%"
+    if not prefix:
+        pattern = "%" + pattern
+    after_score, after_type, after_id = after or (None, None, None)
+    results = fetch_records(
+        search_query,
+        {
+            "query": query_param,
+            "pattern": pattern,
+            "start_date": start_date,
+            "end_date": end_date,
+            "after_score": after_score,
+            "after_type": after_type,
+            "after_id": after_id,
+            # One extra row tells whether there is a next page
+            "limit": limit + 1,
+        },
+    )
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_search_cursor(results[-1])
+    return results, next_cursor
+
+
 @data_bp.route("/search", methods=["GET"])
 def search():
     """
     Endpoint to search for events and parking spaces by name.
-    Fetches data from the 'event' and 'parking_lot' tables in the database.
+    Fetches data from the 'event' and 'parking_lot' tables in the database, ranked by similarity to q.
+
+    Query parameters:
+        q: search text (required)
+        limit: page size, default 20, at most 100
+        cursor: X-Next-Cursor header of the previous page
+        prefix: "true" to match names starting with q instead of containing it
+        from, to: only events whose assembly to disassembly window overlaps these dates (YYYY-MM-DD)
 
     Returns:
         JSON response with the fetched data or an error message if an exception is raised.
+        The X-Next-Cursor header is set when more results follow.
     """
     try:
         query_param = request.args.get("q", "")
         if not query_param:
             return jsonify([])
 
-        search_query = """
-        SELECT 'event' AS type, id, name, color, assembly_start_date, disassembly_end_date
-        FROM event
-        WHERE name ILIKE :query
-        UNION ALL
-        SELECT 'parking_lot' AS type, id, name, '#6a91ce' AS color, NULL AS assembly_start_date, NULL AS disassembly_end_date
-        FROM parking_lot
-        WHERE name ILIKE :query
-        """
+        limit = request.args.get("limit", default=SEARCH_DEFAULT_LIMIT, type=int)
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            return jsonify({"error": f"limit must be between 1 and {SEARCH_MAX_LIMIT}"}), 400
+        prefix = request.args.get("prefix", "false").lower() == "true"
+        try:
+            start_date, end_date = (
+                datetime.strptime(value, "%Y-%m-%d").date() if value else None
+                for value in (request.args.get("from"), request.args.get("to"))
+            )
+            cursor = request.args.get("cursor")
+            after = decode_search_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        results = get_data(search_query, {"query": f"%{query_param}%"})
-        if results.empty:
+        # First pages are what typeahead asks for; cache them per (case-insensitive) query and data version
+        cache_key = None
+        if after is None:
+            cache_key = (
+                query_param.lower(),
+                prefix,
+                start_date,
+                end_date,
+                limit,
+                get_data_version("map", "geometry"),
+            )
+        cached = search_cache.get(cache_key) if cache_key else None
+        if cached is None:
+            cached = search_names(query_param, prefix, start_date, end_date, limit, after)
+            if cache_key:
+                search_cache.set(cache_key, cached)
+        results, next_cursor = cached
+
+        if not results:
             return jsonify({"message": "No data found"}), 204
 
-        return jsonify(results.to_dict(orient="records")), 200
+        response = jsonify(results)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response, 200
     except Exception as e:
         logger.error("Failed to fetch search results from database", exc_info=True)
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
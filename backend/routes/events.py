@@ -2,12 +2,12 @@ import os
 import logging
 from flask import Blueprint, jsonify, request
 from extensions import db
-from utils.helpers import get_data
-import pandas as pd
+from utils.helpers import fetch_records
 from sqlalchemy import text
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import wraps
 from routes.auth import check_edit_rights
+from routes.allocation import reallocate_event_days
 
 events_bp = Blueprint("events", __name__)
 logger = logging.getLogger(__name__)
@@ -44,9 +44,9 @@ def get_events():
             GROUP BY pa.event_id, pl.id, pl.name
         """
 
-        events = get_data(query_events).to_dict(orient="records")
-        demands = get_data(query_demands).to_dict(orient="records")
-        parking_lots = get_data(query_parking_lots).to_dict(orient="records")
+        events = fetch_records(query_events)
+        demands = fetch_records(query_demands)
+        parking_lots = fetch_records(query_parking_lots)
 
         event_map = {event["id"]: event for event in events}
 
@@ -89,27 +89,33 @@ def get_events():
 @events_bp.route("/events_status", methods=["GET"])
 def get_event_status():
     try:
-        query = """
-        WITH daily_capacity AS (
-            SELECT 
-                generate_series(pc.valid_from, pc.valid_to, '1 day'::interval)::date AS date,
-                SUM(pc.capacity) AS total_capacity
-            FROM public.parking_lot_capacity pc
-            GROUP BY date
+        # Optional window: only events overlapping [from, to] are evaluated.
+        # Each event's status still covers its whole assembly-disassembly period.
+        from_date = request.args.get("from")
+        to_date = request.args.get("to")
+
+        query = text(
+            """
+        WITH events AS (
+            SELECT e.id, e.name, e.assembly_start_date, e.disassembly_end_date
+            FROM public.event e
+            WHERE (CAST(:from_date AS date) IS NULL OR e.disassembly_end_date >= CAST(:from_date AS date))
+            AND (CAST(:to_date AS date) IS NULL OR e.assembly_start_date <= CAST(:to_date AS date))
         ),
-        daily_demands AS (
-            SELECT 
-                vd.date,
-                SUM(vd.demand) AS total_demand
-            FROM public.visitor_demand vd
-            GROUP BY vd.date
+        event_periods AS (
+            SELECT
+                e.id AS event_id,
+                e.name,
+                generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval)::date AS date
+            FROM events e
         ),
-        daily_allocations AS (
-            SELECT 
-                pa.date,
-                SUM(pa.allocated_capacity) AS total_allocated_demand
-            FROM public.parking_lot_allocation pa
-            GROUP BY pa.date
+        daily_lots AS (
+            SELECT
+                dl.date,
+                SUM(dl.capacity) AS total_capacity
+            FROM public.daily_lot_rollup dl
+            WHERE dl.date BETWEEN (SELECT MIN(assembly_start_date) FROM events) AND (SELECT MAX(disassembly_end_date) FROM events)
+            GROUP BY dl.date
         ),
         event_specific_demands AS (
             SELECT 
@@ -117,6 +123,7 @@ def get_event_status():
                 vd.date,
                 SUM(vd.demand) AS total_event_demand
             FROM public.visitor_demand vd
+            WHERE vd.event_id IN (SELECT id FROM events)
             GROUP BY vd.event_id, vd.date
         ),
         event_specific_allocations AS (
@@ -125,95 +132,46 @@ def get_event_status():
                 pa.date,
                 SUM(pa.allocated_capacity) AS total_event_allocated_demand
             FROM public.parking_lot_allocation pa
+            WHERE pa.event_id IN (SELECT id FROM events)
             GROUP BY pa.event_id, pa.date
         ),
-        combined AS (
-            SELECT
-                d.date,
-                COALESCE(dc.total_capacity, 0) AS total_capacity,
-                COALESCE(dd.total_demand, 0) AS total_demand,
-                COALESCE(da.total_allocated_demand, 0) AS total_allocated_demand
-            FROM
-                generate_series(
-                    (SELECT MIN(valid_from) FROM public.parking_lot_capacity),
-                    (SELECT MAX(valid_to) FROM public.parking_lot_capacity),
-                    '1 day'::interval
-                ) AS d(date)
-            LEFT JOIN daily_capacity dc ON d.date = dc.date
-            LEFT JOIN daily_demands dd ON d.date = dd.date
-            LEFT JOIN daily_allocations da ON d.date = da.date
-        ),
-        event_periods AS (
-            SELECT
-                e.id AS event_id,
-                e.name,
-                generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval)::date AS date
-            FROM public.event e
-        ),
         event_daily_status AS (
+            -- Status rank per day: not_enough_capacity (3) > demands_to_allocate (2) > no_demands (1) > ok (0)
             SELECT
                 ep.event_id,
                 ep.name,
-                ep.date,
-                c.total_capacity,
-                c.total_demand,
-                c.total_allocated_demand,
-                COALESCE(esd.total_event_demand, 0) AS total_event_demand,
-                COALESCE(esa.total_event_allocated_demand, 0) AS total_event_allocated_demand,
                 CASE
-                    WHEN COALESCE(esd.total_event_demand, 0) = 0 THEN 'no_demands'
-                    WHEN c.total_demand > c.total_capacity THEN 'not_enough_capacity'
-                    WHEN COALESCE(esd.total_event_demand, 0) > 0 AND COALESCE(esa.total_event_allocated_demand, 0) < COALESCE(esd.total_event_demand, 0) THEN 'demands_to_allocate'
-                    ELSE 'ok'
-                END AS status
+                    WHEN COALESCE(esd.total_event_demand, 0) = 0 THEN 1
+                    WHEN COALESCE(dd.demand, 0) > COALESCE(dl.total_capacity, 0) THEN 3
+                    WHEN COALESCE(esa.total_event_allocated_demand, 0) < esd.total_event_demand THEN 2
+                    ELSE 0
+                END AS status_rank
             FROM
                 event_periods ep
-            LEFT JOIN combined c ON ep.date = c.date
+            LEFT JOIN daily_lots dl ON ep.date = dl.date
+            LEFT JOIN public.daily_demand_rollup dd ON ep.date = dd.date
             LEFT JOIN event_specific_demands esd ON ep.event_id = esd.event_id AND ep.date = esd.date
             LEFT JOIN event_specific_allocations esa ON ep.event_id = esa.event_id AND ep.date = esa.date
         )
         SELECT
             event_id,
             name,
-            total_capacity,
-            total_demand,
-            total_allocated_demand,
-            total_event_demand,
-            total_event_allocated_demand,
-            status
+            CASE MAX(status_rank)
+                WHEN 3 THEN 'not_enough_capacity'
+                WHEN 2 THEN 'demands_to_allocate'
+                WHEN 1 THEN 'no_demands'
+                ELSE 'ok'
+            END AS status
         FROM event_daily_status
-        ORDER BY name, date;
+        GROUP BY event_id, name
+        ORDER BY name, event_id;
         """
+        )
 
-        df = pd.read_sql_query(query, db.engine)
-        events_status = df.to_dict(orient="records")
-
-        event_status_summary = {}
-
-        for row in events_status:
-            event_id = row["event_id"]
-            status = row["status"]
-
-            if event_id not in event_status_summary:
-                event_status_summary[event_id] = {
-                    "event_id": event_id,
-                    "name": row["name"],
-                    "status": "ok",
-                }
-
-            if status == "not_enough_capacity":
-                event_status_summary[event_id]["status"] = "not_enough_capacity"
-            elif (
-                status == "demands_to_allocate"
-                and event_status_summary[event_id]["status"] != "not_enough_capacity"
-            ):
-                event_status_summary[event_id]["status"] = "demands_to_allocate"
-            elif status == "no_demands" and event_status_summary[event_id][
-                "status"
-            ] not in ["not_enough_capacity", "demands_to_allocate"]:
-                event_status_summary[event_id]["status"] = "no_demands"
-
-        summary_list = list(event_status_summary.values())
+        result = db.session.execute(
+            query, {"from_date": from_date, "to_date": to_date}
+        ).mappings()
+        summary_list = [dict(row) for row in result]
 
         return jsonify(summary_list), 200
     except Exception as e:
@@ -228,28 +186,23 @@ def get_event_status_daily():
         if not event_id:
             return jsonify({"error": "Event ID is required"}), 400
 
-        query = text(
-            """
-        WITH daily_capacity AS (
-            SELECT 
-                generate_series(pc.valid_from, pc.valid_to, '1 day'::interval)::date AS date,
-                SUM(pc.capacity) AS total_capacity
-            FROM public.parking_lot_capacity pc
-            GROUP BY date
-        ),
-        daily_demands AS (
-            SELECT 
-                vd.date,
-                SUM(vd.demand) AS total_demand
-            FROM public.visitor_demand vd
-            GROUP BY vd.date
+        query = """
+        WITH event_periods AS (
+            SELECT
+                e.id AS event_id,
+                e.name,
+                generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval)::date AS date
+            FROM public.event e
+            WHERE e.id = :event_id
         ),
-        daily_allocations AS (
-            SELECT 
-                pa.date,
-                SUM(pa.allocated_capacity) AS total_allocated_demand
-            FROM public.parking_lot_allocation pa
-            GROUP BY pa.date
+        daily_lots AS (
+            SELECT
+                dl.date,
+                SUM(dl.capacity) AS total_capacity,
+                SUM(dl.allocated_capacity) AS total_allocated_demand
+            FROM public.daily_lot_rollup dl
+            WHERE dl.date BETWEEN (SELECT MIN(date) FROM event_periods) AND (SELECT MAX(date) FROM event_periods)
+            GROUP BY dl.date
         ),
         event_specific_demands AS (
             SELECT 
@@ -269,49 +222,26 @@ def get_event_status_daily():
             WHERE pa.event_id = :event_id
             GROUP BY pa.event_id, pa.date
         ),
-        combined AS (
-            SELECT
-                d.date,
-                COALESCE(dc.total_capacity, 0) AS total_capacity,
-                COALESCE(dd.total_demand, 0) AS total_demand,
-                COALESCE(da.total_allocated_demand, 0) AS total_allocated_demand
-            FROM
-                generate_series(
-                    (SELECT MIN(valid_from) FROM public.parking_lot_capacity),
-                    (SELECT MAX(valid_to) FROM public.parking_lot_capacity),
-                    '1 day'::interval
-                ) AS d(date)
-            LEFT JOIN daily_capacity dc ON d.date = dc.date
-            LEFT JOIN daily_demands dd ON d.date = dd.date
-            LEFT JOIN daily_allocations da ON d.date = da.date
-        ),
-        event_periods AS (
-            SELECT
-                e.id AS event_id,
-                e.name,
-                generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval)::date AS date
-            FROM public.event e
-            WHERE e.id = :event_id
-        ),
         event_daily_status AS (
             SELECT
                 ep.event_id,
                 ep.name,
                 ep.date,
-                c.total_capacity,
-                c.total_demand,
-                c.total_allocated_demand,
+                COALESCE(dl.total_capacity, 0) AS total_capacity,
+                COALESCE(dd.demand, 0) AS total_demand,
+                COALESCE(dl.total_allocated_demand, 0) AS total_allocated_demand,
                 COALESCE(esd.total_event_demand, 0) AS total_event_demand,
                 COALESCE(esa.total_event_allocated_demand, 0) AS total_event_allocated_demand,
                 CASE
                     WHEN COALESCE(esd.total_event_demand, 0) = 0 THEN 'no_demands'
-                    WHEN c.total_demand > c.total_capacity THEN 'not_enough_capacity'
+                    WHEN COALESCE(dd.demand, 0) > COALESCE(dl.total_capacity, 0) THEN 'not_enough_capacity'
                     WHEN COALESCE(esd.total_event_demand, 0) > 0 AND COALESCE(esa.total_event_allocated_demand, 0) < COALESCE(esd.total_event_demand, 0) THEN 'demands_to_allocate'
                     ELSE 'ok'
                 END AS status
             FROM
                 event_periods ep
-            LEFT JOIN combined c ON ep.date = c.date
+            LEFT JOIN daily_lots dl ON ep.date = dl.date
+            LEFT JOIN public.daily_demand_rollup dd ON ep.date = dd.date
             LEFT JOIN event_specific_demands esd ON ep.event_id = esd.event_id AND ep.date = esd.date
             LEFT JOIN event_specific_allocations esa ON ep.event_id = esa.event_id AND ep.date = esa.date
         )
@@ -328,10 +258,8 @@ def get_event_status_daily():
         FROM event_daily_status
         ORDER BY date;
         """
-        )
 
-        df = pd.read_sql_query(query, db.engine, params={"event_id": event_id})
-        daily_status = df.to_dict(orient="records")
+        daily_status = fetch_records(query, {"event_id": event_id})
 
         return jsonify(daily_status), 200
     except Exception as e:
@@ -423,82 +351,53 @@ def add_event():
         result = db.session.execute(text(event_query), event_data)
         event_id = result.fetchone()[0]
 
-        if "halls" in data:
-            hall_ids = db.session.execute(
-                text("SELECT id FROM hall WHERE name IN :names"),
-                {"names": tuple(data["halls"])},
-            ).fetchall()
-            for hall_id in hall_ids:
-                hall_id = hall_id[0]  
-                current_date = datetime.strptime(
-                    data["assembly_start_date"], "%Y-%m-%d"
-                )
-                end_date = datetime.strptime(data["disassembly_end_date"], "%Y-%m-%d")
-                while current_date <= end_date:
-                    hall_query = """
-                        INSERT INTO hall_occupation (event_id, hall_id, date)
-                        VALUES (:event_id, :hall_id, :date)
-                    """
-                    db.session.execute(
-                        text(hall_query),
-                        {
-                            "event_id": event_id,
-                            "hall_id": hall_id,
-                            "date": current_date.strftime("%Y-%m-%d"),
-                        },
-                    )
-                    current_date += timedelta(days=1)
-
-        if "entrances" in data:
-            entrance_ids = db.session.execute(
-                text("SELECT id FROM entrance WHERE name IN :names"),
-                {"names": tuple(data["entrances"])},
-            ).fetchall()
-            for entrance_id in entrance_ids:
-                entrance_id = entrance_id[0]  
-                current_date = datetime.strptime(
-                    data["assembly_start_date"], "%Y-%m-%d"
-                )
-                end_date = datetime.strptime(data["disassembly_end_date"], "%Y-%m-%d")
-                while current_date <= end_date:
-                    entrance_query = """
-                        INSERT INTO entrance_occupation (event_id, entrance_id, date)
-                        VALUES (:event_id, :entrance_id, :date)
-                    """
-                    db.session.execute(
-                        text(entrance_query),
-                        {
-                            "event_id": event_id,
-                            "entrance_id": entrance_id,
-                            "date": current_date.strftime("%Y-%m-%d"),
-                        },
-                    )
-                    current_date += timedelta(days=1)
-
-        current_date = datetime.strptime(data["assembly_start_date"], "%Y-%m-%d")
-        end_date = datetime.strptime(data["disassembly_end_date"], "%Y-%m-%d")
-        while current_date <= end_date:
-            if current_date < datetime.strptime(data["runtime_start_date"], "%Y-%m-%d"):
-                status = "assembly"
-            elif current_date <= datetime.strptime(
-                data["runtime_end_date"], "%Y-%m-%d"
-            ):
-                status = "runtime"
-            else:
-                status = "disassembly"
-            demand_query = """
-                INSERT INTO visitor_demand (event_id, date, car_demand, truck_demand, bus_demand, status)
-                VALUES (:event_id, :date, 0, 0, 0, :status)
+        # One set-based statement per table: rows for every day from assembly start to disassembly end
+        if data.get("halls"):
+            hall_query = """
+                INSERT INTO hall_occupation (event_id, hall_id, date)
+                SELECT e.id, h.id, d.date::date
+                FROM public.event e
+                JOIN public.hall h ON h.name IN :names
+                CROSS JOIN generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval) AS d(date)
+                WHERE e.id = :event_id
             """
             db.session.execute(
-                text(demand_query),
-                {
-                    "event_id": event_id,
-                    "date": current_date.strftime("%Y-%m-%d"),
-                    "status": status,
-                },
+                text(hall_query),
+                {"event_id": event_id, "names": tuple(data["halls"])},
             )
-            current_date += timedelta(days=1)
+
+        if data.get("entrances"):
+            entrance_query = """
+                INSERT INTO entrance_occupation (event_id, entrance_id, date)
+                SELECT e.id, en.id, d.date::date
+                FROM public.event e
+                JOIN public.entrance en ON en.name IN :names
+                CROSS JOIN generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval) AS d(date)
+                WHERE e.id = :event_id
+            """
+            db.session.execute(
+                text(entrance_query),
+                {"event_id": event_id, "names": tuple(data["entrances"])},
+            )
+
+        demand_query = """
+            INSERT INTO visitor_demand (event_id, date, car_demand, truck_demand, bus_demand, status)
+            SELECT
+                e.id,
+                d.date::date,
+                0,
+                0,
+                0,
+                CASE
+                    WHEN d.date < e.runtime_start_date THEN 'assembly'
+                    WHEN d.date <= e.runtime_end_date THEN 'runtime'
+                    ELSE 'disassembly'
+                END
+            FROM public.event e
+            CROSS JOIN generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval) AS d(date)
+            WHERE e.id = :event_id
+        """
+        db.session.execute(text(demand_query), {"event_id": event_id})
 
         db.session.commit()
         return jsonify({"id": event_id}), 201
@@ -514,6 +413,10 @@ def edit_event(id):
         data = request.json
         data["id"] = id
 
+        missing = [key for key in ("halls", "entrances") if key not in data]
+        if missing:
+            return jsonify({"error": f"{' and '.join(missing)} are required"}), 400
+
         date_fields = [
             "assembly_start_date",
             "assembly_end_date",
@@ -544,43 +447,6 @@ def edit_event(id):
                         )
 
 
-        original_event = get_data(
-            """
-            SELECT assembly_start_date, assembly_end_date, runtime_start_date, runtime_end_date, disassembly_start_date, disassembly_end_date
-            FROM public.event
-            WHERE id = :id
-            """,
-            {"id": id},
-        ).to_dict(orient="records")[0]
-
-        def date_range(start_date, end_date):
-            return set(
-                pd.date_range(start=start_date, end=end_date).strftime("%Y-%m-%d")
-            )
-
-        original_dates = (
-            date_range(
-                original_event["assembly_start_date"],
-                original_event["assembly_end_date"],
-            )
-            | date_range(
-                original_event["runtime_start_date"], original_event["runtime_end_date"]
-            )
-            | date_range(
-                original_event["disassembly_start_date"],
-                original_event["disassembly_end_date"],
-            )
-        )
-
-        new_dates = (
-            date_range(data["assembly_start_date"], data["assembly_end_date"])
-            | date_range(data["runtime_start_date"], data["runtime_end_date"])
-            | date_range(data["disassembly_start_date"], data["disassembly_end_date"])
-        )
-
-        dates_to_remove = original_dates - new_dates
-        dates_to_add = new_dates - original_dates
-
         update_event_query = text(
             """
             UPDATE public.event
@@ -597,95 +463,144 @@ def edit_event(id):
         )
         db.session.execute(update_event_query, data)
 
-        clear_halls_query = text("DELETE FROM hall_occupation WHERE event_id = :id")
-        clear_entrances_query = text(
-            "DELETE FROM entrance_occupation WHERE event_id = :id"
-        )
-
-        db.session.execute(clear_halls_query, {"id": id})
-        db.session.execute(clear_entrances_query, {"id": id})
-
-        insert_halls_query = text(
-            """
-            INSERT INTO hall_occupation (event_id, hall_id, date)
-            SELECT :event_id, id, (SELECT runtime_start_date FROM public.event WHERE id = :event_id)
-            FROM hall
-            WHERE name = :hall_name
-            """
-        )
-        for hall_name in data["halls"]:
-            db.session.execute(
-                insert_halls_query, {"event_id": id, "hall_name": hall_name}
-            )
-
-        insert_entrances_query = text(
-            """
-            INSERT INTO entrance_occupation (event_id, entrance_id, date)
-            SELECT :event_id, id, (SELECT runtime_start_date FROM public.event WHERE id = :event_id)
-            FROM entrance
-            WHERE name = :entrance_name
-            """
-        )
-        for entrance_name in data["entrances"]:
-            db.session.execute(
-                insert_entrances_query, {"event_id": id, "entrance_name": entrance_name}
-            )
-
-        if dates_to_remove:
-            delete_demands_query = text(
-                "DELETE FROM visitor_demand WHERE event_id = :event_id AND date IN :dates"
-            )
-            db.session.execute(
-                delete_demands_query, {"event_id": id, "dates": tuple(dates_to_remove)}
-            )
+        # The diff against the stored rows is applied with one statement per table and operation,
+        # each returning the dates it touched. Occupations cover assembly start to disassembly end,
+        # demands and allocations the union of the three phases.
+        params = {
+            "event_id": id,
+            "halls": list(data["halls"]),
+            "entrances": list(data["entrances"]),
+        }
+        in_phases = """(
+            {date} BETWEEN e.assembly_start_date AND e.assembly_end_date
+            OR {date} BETWEEN e.runtime_start_date AND e.runtime_end_date
+            OR {date} BETWEEN e.disassembly_start_date AND e.disassembly_end_date
+        )"""
+        statements = {
+            "hall_occupation": [
+                """
+                DELETE FROM public.hall_occupation ho
+                USING public.event e, public.hall h
+                WHERE e.id = :event_id AND ho.event_id = e.id AND h.id = ho.hall_id
+                AND (NOT h.name = ANY(:halls) OR ho.date NOT BETWEEN e.assembly_start_date AND e.disassembly_end_date)
+                RETURNING ho.date
+                """,
+                """
+                INSERT INTO public.hall_occupation (event_id, hall_id, date)
+                SELECT e.id, h.id, d.date::date
+                FROM public.event e
+                JOIN public.hall h ON h.name = ANY(:halls)
+                CROSS JOIN generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval) AS d(date)
+                WHERE e.id = :event_id
+                ON CONFLICT (event_id, hall_id, date) DO NOTHING
+                RETURNING date
+                """,
+            ],
+            "entrance_occupation": [
+                """
+                DELETE FROM public.entrance_occupation eo
+                USING public.event e, public.entrance en
+                WHERE e.id = :event_id AND eo.event_id = e.id AND en.id = eo.entrance_id
+                AND (NOT en.name = ANY(:entrances) OR eo.date NOT BETWEEN e.assembly_start_date AND e.disassembly_end_date)
+                RETURNING eo.date
+                """,
+                """
+                INSERT INTO public.entrance_occupation (event_id, entrance_id, date)
+                SELECT e.id, en.id, d.date::date
+                FROM public.event e
+                JOIN public.entrance en ON en.name = ANY(:entrances)
+                CROSS JOIN generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval) AS d(date)
+                WHERE e.id = :event_id
+                ON CONFLICT (event_id, entrance_id, date) DO NOTHING
+                RETURNING date
+                """,
+            ],
+            "visitor_demand": [
+                f"""
+                DELETE FROM public.visitor_demand vd
+                USING public.event e
+                WHERE e.id = :event_id AND vd.event_id = e.id
+                AND NOT {in_phases.format(date="vd.date")}
+                RETURNING vd.date
+                """,
+                """
+                UPDATE public.visitor_demand vd
+                SET status = s.status
+                FROM (
+                    SELECT
+                        cur.id,
+                        CASE
+                            WHEN cur.date < e.runtime_start_date THEN 'assembly'
+                            WHEN cur.date <= e.runtime_end_date THEN 'runtime'
+                            ELSE 'disassembly'
+                        END AS status
+                    FROM public.visitor_demand cur
+                    JOIN public.event e ON cur.event_id = e.id
+                    WHERE e.id = :event_id
+                ) s
+                WHERE vd.id = s.id AND vd.status IS DISTINCT FROM s.status
+                RETURNING vd.date
+                """,
+                f"""
+                INSERT INTO public.visitor_demand (event_id, date, car_demand, truck_demand, bus_demand, status)
+                SELECT
+                    e.id,
+                    d.date::date,
+                    0,
+                    0,
+                    0,
+                    CASE
+                        WHEN d.date < e.runtime_start_date THEN 'assembly'
+                        WHEN d.date <= e.runtime_end_date THEN 'runtime'
+                        ELSE 'disassembly'
+                    END
+                FROM public.event e
+                CROSS JOIN generate_series(e.assembly_start_date, e.disassembly_end_date, '1 day'::interval) AS d(date)
+                WHERE e.id = :event_id
+                AND {in_phases.format(date="d.date")}
+                AND NOT EXISTS (
+                    SELECT 1 FROM public.visitor_demand vd
+                    WHERE vd.event_id = e.id AND vd.date = d.date::date
+                )
+                RETURNING date
+                """,
+            ],
+            "parking_lot_allocation": [
+                f"""
+                DELETE FROM public.parking_lot_allocation pa
+                USING public.event e
+                WHERE e.id = :event_id AND pa.event_id = e.id
+                AND NOT {in_phases.format(date="pa.date")}
+                RETURNING pa.date
+                """,
+            ],
+        }
 
-            delete_allocations_query = text(
-                "DELETE FROM public.parking_lot_allocation WHERE event_id = :event_id AND date IN :dates"
-            )
-            db.session.execute(
-                delete_allocations_query,
-                {"event_id": id, "dates": tuple(dates_to_remove)},
-            )
+        touched = {}
+        for table, queries in statements.items():
+            dates = set()
+            for query in queries:
+                dates.update(
+                    row[0] for row in db.session.execute(text(query), params)
+                )
+            if dates:
+                touched[table] = dates
 
-        for date in new_dates - dates_to_add:
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            if date_obj < datetime.strptime(data["runtime_start_date"], "%Y-%m-%d"):
-                new_status = "assembly"
-            elif date_obj <= datetime.strptime(data["runtime_end_date"], "%Y-%m-%d"):
-                new_status = "runtime"
-            else:
-                new_status = "disassembly"
-            update_demand_query = text(
-                "UPDATE visitor_demand SET status = :status WHERE event_id = :event_id AND date = :date"
-            )
-            db.session.execute(
-                update_demand_query,
-                {"event_id": id, "date": date, "status": new_status},
-            )
+        db.session.commit()
 
-        for date in dates_to_add:
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            if date_obj < datetime.strptime(data["runtime_start_date"], "%Y-%m-%d"):
-                status = "assembly"
-            elif date_obj <= datetime.strptime(data["runtime_end_date"], "%Y-%m-%d"):
-                status = "runtime"
-            else:
-                status = "disassembly"
-            demand_query = """
-                INSERT INTO visitor_demand (event_id, date, car_demand, truck_demand, bus_demand, status)
-                VALUES (:event_id, :date, 0, 0, 0, :status)
-            """
-            db.session.execute(
-                text(demand_query),
-                {
-                    "event_id": id,
-                    "date": date,
-                    "status": status,
-                },
+        response = {
+            "message": "Event updated successfully",
+            "touched": {
+                table: sorted(date.strftime("%Y-%m-%d") for date in dates)
+                for table, dates in touched.items()
+            },
+        }
+        if request.args.get("reallocate") == "true":
+            changed_dates = touched.get("visitor_demand", set()) | touched.get(
+                "parking_lot_allocation", set()
             )
-
-        db.session.commit()
-        return jsonify({"message": "Event updated successfully"}), 200
+            response["reallocated"] = len(reallocate_event_days(id, changed_dates))
+        return jsonify(response), 200
     except Exception as e:
         logger.error(e)
         return jsonify({"error": str(e)}), 500
@@ -701,7 +616,7 @@ def get_event(id):
             FROM event e
             WHERE e.id = :id
         """
-        event = get_data(query_event, {"id": id}).to_dict(orient="records")
+        event = fetch_records(query_event, {"id": id})
         if event:
             return jsonify(event[0]), 200
         else:
@@ -719,7 +634,7 @@ def get_event_demands(event_id):
             FROM visitor_demand vd
             WHERE vd.event_id = :event_id
         """
-        demands = get_data(query, {"event_id": event_id}).to_dict(orient="records")
+        demands = fetch_records(query, {"event_id": event_id})
         if not demands:
             return jsonify([]), 204
         return jsonify(demands), 200
@@ -748,7 +663,7 @@ def get_event_allocations(eventid):
             WHERE 
                 pa.event_id = :event_id
         """
-        allocations = get_data(query, {"event_id": eventid}).to_dict(orient="records")
+        allocations = fetch_records(query, {"event_id": eventid})
         if not allocations:
             return jsonify([]), 204
         return jsonify(allocations), 200
@@ -762,8 +677,28 @@ def get_event_allocations(eventid):
 def update_event_demands(event_id):
     try:
         data = request.json
+        previous_demands = {
+            row["id"]: row
+            for row in db.session.execute(
+                text(
+                    """
+                    SELECT id, date, car_demand, truck_demand, bus_demand
+                    FROM visitor_demand
+                    WHERE event_id = :event_id
+                    """
+                ),
+                {"event_id": event_id},
+            ).mappings()
+        }
+        changed_dates = set()
         for demand in data:
             demand["event_id"] = event_id
+            previous = previous_demands.get(demand["id"])
+            if previous is not None and any(
+                int(demand[field]) != previous[field]
+                for field in ["car_demand", "truck_demand", "bus_demand"]
+            ):
+                changed_dates.add(previous["date"])
             query = text(
                 """
                 UPDATE visitor_demand
@@ -776,7 +711,13 @@ def update_event_demands(event_id):
             )
             db.session.execute(query, demand)
         db.session.commit()
-        return jsonify({"message": "Demands updated successfully"}), 200
+
+        response = {"message": "Demands updated successfully"}
+        if request.args.get("reallocate") == "true":
+            response["reallocated"] = len(
+                reallocate_event_days(event_id, changed_dates)
+            )
+        return jsonify(response), 200
     except Exception as e:
         logger.error(e)
         return jsonify({"error": str(e)}), 500
@@ -791,75 +732,33 @@ def get_parking_lot_capacities():
         if not start_date or not end_date:
             return jsonify({"error": "start_date and end_date are required"}), 400
 
-        query = text(
-            """
-        WITH capacity_per_date AS (
-            SELECT
-                pc.parking_lot_id,
-                pc.capacity,
-                pc.truck_limit,
-                pc.bus_limit,
-                generate_series(pc.valid_from, pc.valid_to, '1 day'::interval) AS date
-            FROM
-                public.parking_lot_capacity pc
-        ),
-        allocations AS (
-            SELECT
-                pa.date,
-                pa.parking_lot_id,
-                pa.event_id,
-                pa.allocated_capacity,
-                pa.allocated_cars,
-                pa.allocated_trucks,
-                pa.allocated_buses
-            FROM
-                public.parking_lot_allocation pa
-        ),
-        combined AS (
-            SELECT
-                cpd.date,
-                cpd.parking_lot_id,
-                cpd.capacity,
-                cpd.truck_limit,
-                cpd.bus_limit,
-                COALESCE(SUM(a.allocated_capacity), 0) AS used_capacity,
-                COALESCE(SUM(a.allocated_cars), 0) AS used_cars,
-                COALESCE(SUM(a.allocated_trucks), 0) AS used_trucks,
-                COALESCE(SUM(a.allocated_buses), 0) AS used_buses
-            FROM
-                capacity_per_date cpd
-            LEFT JOIN
-                allocations a ON cpd.parking_lot_id = a.parking_lot_id AND cpd.date = a.date
-            WHERE
-                cpd.date BETWEEN :start_date AND :end_date
-            GROUP BY
-                cpd.date, cpd.parking_lot_id, cpd.capacity, cpd.truck_limit, cpd.bus_limit
-        )
+        query = """
         SELECT
-            c.date,
-            c.parking_lot_id,
+            dl.date,
+            dl.parking_lot_id,
             pl.name AS parking_lot_name,
-            c.capacity,
-            c.truck_limit,
-            c.bus_limit,
-            c.used_capacity,
-            c.used_cars,
-            c.used_trucks,
-            c.used_buses,
-            c.capacity - c.used_capacity AS free_capacity
+            dl.capacity,
+            dl.truck_limit,
+            dl.bus_limit,
+            dl.allocated_capacity AS used_capacity,
+            dl.cars AS used_cars,
+            dl.trucks AS used_trucks,
+            dl.buses AS used_buses,
+            dl.capacity - dl.allocated_capacity AS free_capacity
         FROM
-            combined c
+            public.daily_lot_rollup dl
         JOIN
-            public.parking_lot pl ON c.parking_lot_id = pl.id
+            public.parking_lot pl ON dl.parking_lot_id = pl.id
+        WHERE
+            dl.date BETWEEN :start_date AND :end_date
+            AND dl.capacity IS NOT NULL
         ORDER BY
-            c.date, pl.name;
+            dl.date, pl.name;
         """
-        )
 
-        df = pd.read_sql_query(
-            query, db.engine, params={"start_date": start_date, "end_date": end_date}
+        parking_lot_capacities = fetch_records(
+            query, {"start_date": start_date, "end_date": end_date}
         )
-        parking_lot_capacities = df.to_dict(orient="records")
 
         return jsonify(parking_lot_capacities), 200
     except Exception as e:
@@ -878,11 +777,6 @@ def allocate_demands():
         if not event_id:
             return jsonify({"error": "Event ID must be provided"}), 400
 
-        if allocations:
-            allocations_df = pd.DataFrame(allocations)
-            print("Received allocations:")
-            print(allocations_df)
-
         delete_event_query = text(
             """
             DELETE FROM public.parking_lot_allocation
@@ -898,83 +792,88 @@ def allocate_demands():
                 200,
             )
 
-        for allocation in allocations:
-            capacity_query = text(
-                """
-                SELECT capacity - COALESCE(SUM(allocated_capacity), 0) AS free_capacity
-                FROM public.parking_lot_capacity pc
-                LEFT JOIN public.parking_lot_allocation pa ON pc.parking_lot_id = pa.parking_lot_id AND pa.date = :date
-                WHERE pc.parking_lot_id = :parking_lot_id AND :date BETWEEN pc.valid_from AND pc.valid_to
-                GROUP BY pc.capacity
-                """
-            )
-            result = db.session.execute(
-                capacity_query,
-                {
-                    "parking_lot_id": allocation["parking_lot_id"],
-                    "date": allocation["date"],
-                },
-            ).fetchone()
-
-            if result is not None:
-                free_capacity = result[
-                    0
-                ]  
-            else:
-                free_capacity = 0
-
-            allocated_capacity = (
-                allocation["allocated_cars"]
-                + 4 * allocation["allocated_trucks"]
-                + 3 * allocation["allocated_buses"]
-            )
-
-            if free_capacity < allocated_capacity:
-                parking_lot_name_query = text(
-                    """
-                    SELECT name FROM public.parking_lot WHERE id = :parking_lot_id
-                    """
-                )
-                parking_lot_name_result = db.session.execute(
-                    parking_lot_name_query,
-                    {"parking_lot_id": allocation["parking_lot_id"]},
-                ).fetchone()
-                parking_lot_name = (
-                    parking_lot_name_result[0]
-                    if parking_lot_name_result
-                    else "Unknown Parking Lot"
-                )
-
-                return (
-                    jsonify(
-                        {
-                            "error": f"Insufficient capacity for parking lot '{parking_lot_name}' on {allocation['date']}. Free capacity: {free_capacity}, Required: {allocated_capacity}"
-                        }
-                    ),
-                    400,
-                )
+        params = {
+            "event_id": event_id,
+            "parking_lot_ids": [a["parking_lot_id"] for a in allocations],
+            "dates": [a["date"] for a in allocations],
+            "cars": [a["allocated_cars"] for a in allocations],
+            "trucks": [a["allocated_trucks"] for a in allocations],
+            "buses": [a["allocated_buses"] for a in allocations],
+        }
+        submitted = """
+            SELECT *
+            FROM unnest(
+                CAST(:parking_lot_ids AS integer[]),
+                CAST(:dates AS date[]),
+                CAST(:cars AS integer[]),
+                CAST(:trucks AS integer[]),
+                CAST(:buses AS integer[])
+            ) AS s(parking_lot_id, date, allocated_cars, allocated_trucks, allocated_buses)
+        """
 
-        for allocation in allocations:
-            insert_query = text(
-                """
-                INSERT INTO public.parking_lot_allocation (
-                    event_id, parking_lot_id, date, allocated_cars, allocated_trucks, allocated_buses
-                ) VALUES (
-                    :event_id, :parking_lot_id, :date, :allocated_cars, :allocated_trucks, :allocated_buses
-                )
-                """
+        # All submitted rows are checked in one query: per (lot, date) the submitted capacity
+        # against the lot's capacity minus the allocations of the other events.
+        validation_query = text(
+            f"""
+            WITH submitted AS ({submitted}),
+            required AS (
+                SELECT parking_lot_id, date,
+                       SUM(allocated_cars + 4 * allocated_trucks + 3 * allocated_buses) AS required_capacity
+                FROM submitted
+                GROUP BY parking_lot_id, date
+            ),
+            capacity AS (
+                SELECT r.parking_lot_id, r.date, COALESCE(SUM(pc.capacity), 0) AS capacity
+                FROM required r
+                LEFT JOIN public.parking_lot_capacity pc
+                    ON pc.parking_lot_id = r.parking_lot_id AND pc.validity @> r.date
+                GROUP BY r.parking_lot_id, r.date
+            ),
+            allocated AS (
+                SELECT r.parking_lot_id, r.date, COALESCE(SUM(pa.allocated_capacity), 0) AS allocated_capacity
+                FROM required r
+                LEFT JOIN public.parking_lot_allocation pa
+                    ON pa.parking_lot_id = r.parking_lot_id AND pa.date = r.date
+                GROUP BY r.parking_lot_id, r.date
             )
-            db.session.execute(
-                insert_query,
-                {
-                    "event_id": event_id,
-                    "parking_lot_id": allocation["parking_lot_id"],
-                    "date": allocation["date"],
-                    "allocated_cars": allocation["allocated_cars"],
-                    "allocated_trucks": allocation["allocated_trucks"],
-                    "allocated_buses": allocation["allocated_buses"],
-                },
+            SELECT
+                r.parking_lot_id,
+                COALESCE(pl.name, 'Unknown Parking Lot') AS parking_lot_name,
+                r.date,
+                c.capacity - a.allocated_capacity AS free_capacity,
+                r.required_capacity
+            FROM required r
+            JOIN capacity c ON c.parking_lot_id = r.parking_lot_id AND c.date = r.date
+            JOIN allocated a ON a.parking_lot_id = r.parking_lot_id AND a.date = r.date
+            LEFT JOIN public.parking_lot pl ON pl.id = r.parking_lot_id
+            WHERE r.required_capacity > c.capacity - a.allocated_capacity
+            ORDER BY r.date, parking_lot_name
+            """
+        )
+        violations = [
+            dict(row) for row in db.session.execute(validation_query, params).mappings()
+        ]
+        if violations:
+            db.session.rollback()
+            messages = [
+                f"Insufficient capacity for parking lot '{v['parking_lot_name']}' on {v['date']}. "
+                f"Free capacity: {v['free_capacity']}, Required: {v['required_capacity']}"
+                for v in violations
+            ]
+            for violation in violations:
+                violation["date"] = violation["date"].strftime("%Y-%m-%d")
+            return jsonify({"error": " ".join(messages), "violations": violations}), 400
+
+        insert_query = text(
+            f"""
+            INSERT INTO public.parking_lot_allocation (
+                event_id, parking_lot_id, date, allocated_cars, allocated_trucks, allocated_buses
             )
+            SELECT :event_id, parking_lot_id, date, allocated_cars, allocated_trucks, allocated_buses
+            FROM ({submitted}) s
+            """
+        )
+        db.session.execute(insert_query, params)
 
         db.session.commit()
         return jsonify({"message": "Allocations saved successfully"}), 201
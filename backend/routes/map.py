@@ -1,138 +1,243 @@
 import logging
 from datetime import datetime, timedelta
 
-from flask import Blueprint, jsonify
-from utils.helpers import get_data
+from flask import Blueprint, Response, current_app, jsonify, request
+from utils.cache import TTLCache
+from utils.helpers import fetch_records, get_data_version
 
 map_bp = Blueprint("map", __name__)
 logger = logging.getLogger(__name__)
 
+# Serialized /map_data responses keyed by (date, (map version, geometry version)).
+# Writes bump the versions in public.data_version, so stale entries are never hit.
+map_data_cache = TTLCache(maxsize=256, ttl=600)
+# Serialized /timeline responses keyed by (from, to, map version, geometry version);
+# the timeline carries parking lot names, which only move the geometry version
+timeline_cache = TTLCache(maxsize=512, ttl=600)
+# Serialized /geometry response keyed by geometry version
+geometry_cache = TTLCache(maxsize=4, ttl=3600)
+
 
 @map_bp.route("/map_data/<date>", methods=["GET"])
 def get_map_data(date):
     try:
         date = datetime.strptime(date, "%Y-%m-%d").date()
-        start_date = date - timedelta(days=365)
-        end_date = date + timedelta(days=365)
-
-        query_events_timeline = f"""
-        SELECT 
-            e.event_id,
-            e.assembly_start_date,
-            e.assembly_end_date,
-            e.runtime_start_date,
-            e.runtime_end_date,
-            e.disassembly_start_date,
-            e.disassembly_end_date,
-            e.early_assembly_start_date,
-            e.early_assembly_end_date,
-            e.late_disassembly_start_date,
-            e.late_disassembly_end_date,
-            e.event_color,
-            e.event_name,
-            e.halls,
-            STRING_AGG(DISTINCT eo.entrance_id::text, ', ') AS event_entrance
-        FROM 
-            view_schema.view_events_timeline e
-        LEFT JOIN 
-            public.entrance_occupation eo ON e.event_id = eo.event_id
-        WHERE 
-            (e.disassembly_end_date >= '{start_date}' AND e.assembly_start_date <= '{end_date}')
-        GROUP BY 
-            e.event_id, e.assembly_start_date, e.assembly_end_date, e.runtime_start_date, e.runtime_end_date, e.disassembly_start_date, e.disassembly_end_date, e.early_assembly_start_date, e.early_assembly_end_date, e.late_disassembly_start_date, e.late_disassembly_end_date, e.event_color, e.event_name, e.halls
-        """
-        df_events_timeline = get_data(query_events_timeline)
-        events_timeline = df_events_timeline.to_dict(orient="records")
-
-        query_parking_lots_capacity = f"""
-        SELECT 
-            pl.id, 
-            pl.name AS name, 
-            pl.external AS external, 
-            plc.capacity AS capacity,
-            plc.utilization_type AS utilization_type,
-            dates.date
-        FROM 
-            public.parking_lot pl
-        JOIN 
-            public.parking_lot_capacity plc ON pl.id = plc.parking_lot_id
-        CROSS JOIN 
-            generate_series('{start_date}', '{end_date}', '1 day'::interval) AS dates(date)
-        WHERE 
-            plc.valid_from <= dates.date AND plc.valid_to >= dates.date
-        ORDER BY 
-            pl.id, dates.date;
-        """
-        df_parking_lots_capacity = get_data(query_parking_lots_capacity)
-        parking_lots_capacity = df_parking_lots_capacity.to_dict(orient="records")
-
-        query_parking_lots_occupancy = f"""
-        SELECT 
-            pa.date, 
-            pl.name AS parking_lot_name, 
-            SUM(pa.allocated_capacity) AS occupancy
-        FROM 
-            public.parking_lot_allocation pa
-        JOIN 
-            public.parking_lot pl ON pa.parking_lot_id = pl.id
-        WHERE 
-            pa.date BETWEEN '{start_date}' AND '{end_date}'
-        GROUP BY 
-            pa.date, pl.name
-        ORDER BY 
-            pa.date, pl.name;
-        """
-        df_parking_lots_occupancy = get_data(query_parking_lots_occupancy)
-        parking_lots_occupancy = df_parking_lots_occupancy.to_dict(orient="records")
-
-        query_parking_lots_allocations = f"""
-        SELECT 
-            pa.parking_lot_id, 
-            pl.name AS parking_lot_name, 
-            pa.event_id, 
-            e.name AS event_name, 
-            e.color AS event_color, 
-            pa.allocated_capacity, 
-            pa.date
-        FROM 
-            public.parking_lot_allocation pa
-        JOIN 
-            public.parking_lot pl ON pa.parking_lot_id = pl.id
-        JOIN 
-            public.event e ON pa.event_id = e.id
-        WHERE 
-            pa.date BETWEEN '{start_date}' AND '{end_date}'
-        ORDER BY 
-            pa.parking_lot_id, pa.event_id, pa.date;
-        """
-        df_parking_lots_allocations = get_data(query_parking_lots_allocations)
-        parking_lots_allocations = df_parking_lots_allocations.to_dict(orient="records")
-
-        query_halls = "SELECT id, name, coordinates FROM public.hall"
-        df_halls = get_data(query_halls)
-        halls_data = df_halls.to_dict(orient="records")
-
-        query_parking_lots = "SELECT id, name, coordinates FROM public.parking_lot"
-        df_parking_lots = get_data(query_parking_lots)
-        parking_lots_data = df_parking_lots.to_dict(orient="records")
-
-        query_entrances = "SELECT id, name, coordinates FROM public.entrance"
-        df_entrances = get_data(query_entrances)
-        entrances_data = df_entrances.to_dict(orient="records")
-
-        data = {
-            "events_timeline": events_timeline,
-            "parking_lots_capacity": parking_lots_capacity,
-            "parking_lots_occupancy": parking_lots_occupancy,
-            "parking_lots_allocations": parking_lots_allocations,
-            "coordinates": {
-                "halls": halls_data,
-                "parking_lots": parking_lots_data,
-                "entrances": entrances_data,
-            },
-        }
-
-        return jsonify(data), 200
+        cache_key = (date, get_data_version("map", "geometry"))
+        body = map_data_cache.get(cache_key)
+        if body is None:
+            body = current_app.json.dumps(build_map_data(date))
+            map_data_cache.set(cache_key, body)
+
+        return Response(body, status=200, mimetype="application/json")
     except Exception as e:
         print("Error occurred:", str(e))
         return jsonify({"error": str(e)}), 500
+
+
+@map_bp.route("/geometry", methods=["GET"])
+def get_geometry():
+    """
+    Coordinates of halls, parking lots and entrances. The ETag is the geometry data version,
+    so clients revalidate with If-None-Match and get a 304 until the geometry changes.
+    """
+    try:
+        (version,) = get_data_version("geometry")
+        etag = f"geometry-{version}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            body = geometry_cache.get(version)
+            if body is None:
+                body = current_app.json.dumps(fetch_geometry())
+                geometry_cache.set(version, body)
+            response = Response(body, status=200, mimetype="application/json")
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    except Exception as e:
+        logger.error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+@map_bp.route("/timeline", methods=["GET"])
+def get_timeline():
+    """
+    Timeline data (events, daily capacities, occupancies and allocations) for the days in [from, to].
+    Clients pass the version ("<map version>.<geometry version>") and the window they already hold
+    (known_from, known_to) and only request the missing days. If their version is stale, the response covers the union of both
+    windows; clients see the new version in the response and replace their data instead of merging.
+    """
+    try:
+        start_date = datetime.strptime(request.args.get("from"), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.args.get("to"), "%Y-%m-%d").date()
+        if start_date > end_date:
+            return jsonify({"error": "from must not be after to"}), 400
+
+        map_version, geometry_version = get_data_version("map", "geometry")
+        version = f"{map_version}.{geometry_version}"
+        client_version = request.args.get("version")
+        known_from = request.args.get("known_from")
+        known_to = request.args.get("known_to")
+        if client_version is not None and client_version != version:
+            if known_from and known_to:
+                start_date = min(
+                    start_date, datetime.strptime(known_from, "%Y-%m-%d").date()
+                )
+                end_date = max(
+                    end_date, datetime.strptime(known_to, "%Y-%m-%d").date()
+                )
+
+        cache_key = (start_date, end_date, map_version, geometry_version)
+        body = timeline_cache.get(cache_key)
+        if body is None:
+            data = fetch_timeline(start_date, end_date)
+            data.update(
+                {
+                    "version": version,
+                    "from": start_date.isoformat(),
+                    "to": end_date.isoformat(),
+                }
+            )
+            body = current_app.json.dumps(data)
+            timeline_cache.set(cache_key, body)
+
+        return Response(body, status=200, mimetype="application/json")
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid parameters: {e}"}), 400
+    except Exception as e:
+        logger.error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+def fetch_timeline(start_date, end_date):
+    params = {"start_date": start_date, "end_date": end_date}
+
+    query_events_timeline = """
+    SELECT
+        e.event_id,
+        e.assembly_start_date,
+        e.assembly_end_date,
+        e.runtime_start_date,
+        e.runtime_end_date,
+        e.disassembly_start_date,
+        e.disassembly_end_date,
+        e.early_assembly_start_date,
+        e.early_assembly_end_date,
+        e.late_disassembly_start_date,
+        e.late_disassembly_end_date,
+        e.event_color,
+        e.event_name,
+        e.halls,
+        STRING_AGG(DISTINCT eo.entrance_id::text, ', ') AS event_entrance
+    FROM
+        view_schema.view_events_timeline e
+    LEFT JOIN
+        public.entrance_occupation eo ON e.event_id = eo.event_id
+    WHERE
+        (e.disassembly_end_date >= :start_date AND e.assembly_start_date <= :end_date)
+    GROUP BY
+        e.event_id, e.assembly_start_date, e.assembly_end_date, e.runtime_start_date, e.runtime_end_date, e.disassembly_start_date, e.disassembly_end_date, e.early_assembly_start_date, e.early_assembly_end_date, e.late_disassembly_start_date, e.late_disassembly_end_date, e.event_color, e.event_name, e.halls
+    """
+    events_timeline = fetch_records(query_events_timeline, params)
+
+    query_parking_lots_capacity = """
+    SELECT
+        pl.id,
+        pl.name AS name,
+        pl.external AS external,
+        r.capacity AS capacity,
+        ut.utilization_type AS utilization_type,
+        r.date
+    FROM
+        public.daily_lot_rollup r
+    JOIN
+        public.parking_lot pl ON pl.id = r.parking_lot_id
+    LEFT JOIN LATERAL (
+        SELECT plc.utilization_type
+        FROM public.parking_lot_capacity plc
+        WHERE plc.parking_lot_id = r.parking_lot_id
+        AND plc.validity @> r.date
+        ORDER BY plc.valid_from DESC
+        LIMIT 1
+    ) ut ON TRUE
+    WHERE
+        r.date BETWEEN :start_date AND :end_date
+        AND r.capacity IS NOT NULL
+    ORDER BY
+        pl.id, r.date;
+    """
+    parking_lots_capacity = fetch_records(query_parking_lots_capacity, params)
+
+    query_parking_lots_occupancy = """
+    SELECT
+        pa.date,
+        pl.name AS parking_lot_name,
+        SUM(pa.allocated_capacity) AS occupancy
+    FROM
+        public.parking_lot_allocation pa
+    JOIN
+        public.parking_lot pl ON pa.parking_lot_id = pl.id
+    WHERE
+        pa.date BETWEEN :start_date AND :end_date
+    GROUP BY
+        pa.date, pl.name
+    ORDER BY
+        pa.date, pl.name;
+    """
+    parking_lots_occupancy = fetch_records(query_parking_lots_occupancy, params)
+
+    query_parking_lots_allocations = """
+    SELECT
+        pa.parking_lot_id,
+        pl.name AS parking_lot_name,
+        pa.event_id,
+        e.name AS event_name,
+        e.color AS event_color,
+        pa.allocated_capacity,
+        pa.date
+    FROM
+        public.parking_lot_allocation pa
+    JOIN
+        public.parking_lot pl ON pa.parking_lot_id = pl.id
+    JOIN
+        public.event e ON pa.event_id = e.id
+    WHERE
+        pa.date BETWEEN :start_date AND :end_date
+    ORDER BY
+        pa.parking_lot_id, pa.event_id, pa.date;
+    """
+    parking_lots_allocations = fetch_records(query_parking_lots_allocations, params)
+
+    return {
+        "events_timeline": events_timeline,
+        "parking_lots_capacity": parking_lots_capacity,
+        "parking_lots_occupancy": parking_lots_occupancy,
+        "parking_lots_allocations": parking_lots_allocations,
+    }
+
+
+def fetch_geometry():
+    query_halls = "SELECT id, name, coordinates FROM public.hall"
+    halls_data = fetch_records(query_halls)
+
+    query_parking_lots = "SELECT id, name, coordinates FROM public.parking_lot"
+    parking_lots_data = fetch_records(query_parking_lots)
+
+    query_entrances = "SELECT id, name, coordinates FROM public.entrance"
+    entrances_data = fetch_records(query_entrances)
+
+    return {
+        "halls": halls_data,
+        "parking_lots": parking_lots_data,
+        "entrances": entrances_data,
+    }
+
+
+def build_map_data(date):
+    start_date = date - timedelta(days=365)
+    end_date = date + timedelta(days=365)
+
+    data = fetch_timeline(start_date, end_date)
+    data["coordinates"] = fetch_geometry()
+    return data
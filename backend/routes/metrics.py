@@ -0,0 +1,20 @@
+import logging
+
+from extensions import db
+from flask import Blueprint, jsonify
+from routes.auth import check_edit_rights
+from utils.db_metrics import pool_status
+
+metrics_bp = Blueprint("metrics", __name__)
+logger = logging.getLogger(__name__)
+
+
+@metrics_bp.route("/pool", methods=["GET"])
+@check_edit_rights
+def get_pool_metrics():
+    """Connection pool state, checkout wait times and connection reuse rate of this worker."""
+    try:
+        return jsonify(pool_status(db.engine)), 200
+    except Exception as e:
+        logger.error(e)
+        return jsonify({"error": str(e)}), 500
@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify, request
 from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 from extensions import db
-from utils.helpers import get_data
+from utils.helpers import fetch_records
 import logging
 from functools import wraps
 from routes.auth import check_edit_rights
@@ -10,6 +10,10 @@ from routes.auth import check_edit_rights
 parking_bp = Blueprint("parking", __name__)
 logger = logging.getLogger(__name__)
 
+OVERLAPPING_CAPACITY_ERROR = (
+    "The validity period overlaps an existing capacity entry of this parking lot."
+)
+
 
 @parking_bp.route("/spaces", methods=["GET"])
 def get_parking_spaces():
@@ -18,7 +22,7 @@ def get_parking_spaces():
         SELECT id, name, service_toilets, surface_material, service_shelter, pricing, external
         FROM public.parking_lot
         """
-        parking_spaces = get_data(query).to_dict(orient="records")
+        parking_spaces = fetch_records(query)
         return jsonify(parking_spaces), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -183,7 +187,7 @@ def get_parking_space_capacities(parking_lot_id):
         """
         params = {"parking_lot_id": parking_lot_id}
 
-        capacities = get_data(query, params).to_dict(orient="records")
+        capacities = fetch_records(query, params)
 
         if not capacities:
             return jsonify({"message": "No capacities found"}), 204
@@ -240,6 +244,8 @@ def add_parking_space_capacity(parking_lot_id):
             201,
         )
     except IntegrityError as e:
+        if "parking_lot_capacity_no_overlap" in str(e.orig):
+            return jsonify({"error": OVERLAPPING_CAPACITY_ERROR}), 400
         if "unique constraint" in str(e.orig):
             return (
                 jsonify({"error": "A capacity entry with this ID already exists."}),
@@ -281,6 +287,10 @@ def edit_parking_space_capacity(capacity_id):
             connection.commit()
 
         return jsonify({"message": "Capacity updated successfully"}), 200
+    except IntegrityError as e:
+        if "parking_lot_capacity_no_overlap" in str(e.orig):
+            return jsonify({"error": OVERLAPPING_CAPACITY_ERROR}), 400
+        return jsonify({"error": "Integrity error occurred."}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -319,11 +329,11 @@ def get_parking_space_occupations(parking_lot_id):
         JOIN public.parking_lot_capacity c ON a.parking_lot_id = c.parking_lot_id
         JOIN public.event e ON a.event_id = e.id
         WHERE a.parking_lot_id = :parking_lot_id
-        AND a.date BETWEEN c.valid_from AND c.valid_to
+        AND c.validity @> a.date
         ORDER BY a.date ASC
         """
         params = {"parking_lot_id": parking_lot_id}
-        allocations = get_data(query, params).to_dict(orient="records")
+        allocations = fetch_records(query, params)
 
         if not allocations:
             return jsonify({"message": "No allocations found"}), 204
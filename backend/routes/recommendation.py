@@ -35,10 +35,9 @@ Credits: Timon Tirtey (LMU), Sven Tiefenthaler (LMU)
 3. Create a Flask Blueprint for the recommendation route
    - recommendation_bp = Blueprint("recommendation", __name__)
 
-4. Define distances data and create a DataFrame from the values
-   - Split the raw data string into lines and then into individual values
-   - Create a DataFrame from the values
-   - Convert the columns to the appropriate data types
+4. Load the entrance x parking lot distance matrix
+   - Read entrance_parking_lot_distance once into a NumPy matrix (utils.distances.DistanceMatrix)
+   - Average distances per hall set are memoized per frozenset of hall ids
 
 2. Fetch parking lots based on material and service level
     a) Define the get_parking_lots function
@@ -55,20 +54,17 @@ Credits: Timon Tirtey (LMU), Sven Tiefenthaler (LMU)
 
 3. Calculate average distance for a parking lot from given hall IDs
     a) Define the get_average_distance function
-    b) Fetch distances from the distances DataFrame
-        - distances = distances_df[(distances_df['entrance_id'].isin(hall_ids)) & (distances_df['parking_lot_id'] == parking_lot_id)]
-    c) Calculate and return the average distance
-        - if not distances.empty:
-            - average_distance = distances['distance'].mean()
-        - else:
-            - average_distance = float('inf')
-        - return average_distance
+    b) Look up the memoized average distances of the hall set in the distance matrix
+        - averages = get_distance_matrix().average_distances(hall_ids)
+    c) Return the average distance of the parking lot
+        - float('inf') if no distance is known for the lot
 
 4. Fetch parking capacities for given parking lot IDs, start and end dates, excluding allocations for a specific event
     a) Define the fetch_parking_capacities function
-    b) Construct and execute the SQL query to fetch capacities
-    c) Fetch results and convert to a dictionary
-        - capacities = {row[0]: row[1:] for row in result}
+    b) Load a CapacityLedger for the date range if none is passed in
+        - recommendation_engine loads one ledger per event, so all phases and passes share a single bulk read
+    c) Read the minimum free capacity, truck units and bus units per lot from the ledger
+        - capacities = ledger.min_free(parking_lot_ids, start_date, end_date, exclude_event_id=event_id)
     d) Return the capacities
         - return capacities
 
@@ -95,10 +91,10 @@ Credits: Timon Tirtey (LMU), Sven Tiefenthaler (LMU)
 
 6. Calculate priority based on distances and remaining capacity
     a) Define the calculate_priority function
-    b) Calculate the average distance for each parking lot
-        - df['average_distance'] = df['parking_lot_id'].apply(lambda lot_id: get_average_distance(hall_ids, lot_id))
+    b) Map the average distance of the hall set onto each parking lot
+        - df['average_distance'] = df['parking_lot_id'].map(average_by_lot).fillna(float('inf'))
     c) Calculate the priority weighting as a combination of average distance and inverse of remaining capacity
-        - df['prio_weighting'] = df.apply(lambda row: row['average_distance'] + (1000 / (row['remaining_free_capacity'] + 1)), axis=1)
+        - df['prio_weighting'] = df['average_distance'] + (1000 / (df['remaining_free_capacity'] + 1))
     d) Return the updated DataFrame
         - return df
 
@@ -107,14 +103,17 @@ Credits: Timon Tirtey (LMU), Sven Tiefenthaler (LMU)
     b) Initialize assigned lots and remaining demand dictionaries
         - assigned_lots = {'cars': [], 'buses': [], 'trucks': []}
         - remaining_demand = {'cars': car_demand, 'buses': bus_demand, 'trucks': truck_demand}
-    c) Determine if any halls belong to west halls
+    c) Determine if any halls belong to west halls (rank_lots)
         - prioritize_20 = any(hall in west_halls for hall in hall_ids)
-    d) Calculate average distances and sort lots based on distance and priority
+    d) Calculate average distances and sort lots based on distance and priority (rank_lots)
         - lots_with_distances = [(lot, get_average_distance(hall_ids, lot['id'])) for lot in lots]
         - if prioritize_20:
             - lots_sorted = sorted(lots_with_distances, key=lambda x: (x[0]['id'] != 20, x[1], x[0]['id']))
         - else:
             - lots_sorted = sorted(lots_with_distances, key=lambda x: (x[1], x[0]['id']))
+        - with ranked=True the lots come from get_ranked_lots and are already sorted
+            - get_ranked_lots caches the sorted pairs per (frozenset(hall_ids), service_level, material)
+            - the key includes the 'lots' data version, so writes to parking_lot or entrance_parking_lot_distance invalidate it
     e) Prepare capacity data and calculate priority
         - capacity_df = prepare_capacity_data([lot[0] for lot in lots_sorted], start_date, end_date, event_id)
         - capacity_df = calculate_priority(capacity_df, hall_ids)
@@ -165,23 +164,31 @@ Credits: Timon Tirtey (LMU), Sven Tiefenthaler (LMU)
             - bus_demand = int(event[f'{phase}_demand_buses'])
             - truck_demand = int(event[f'{phase}_demand_trucks'])
     c) Fetch suitable parking lots and assign parking
+        - lots_version = get_data_version('lots')[0], read once per call unless passed in
         - if car_demand > 0:
-            - suitable_lots = get_parking_lots(service_level='high')
-            - assigned_cars, remaining_cars = assign_parking(suitable_lots, car_demand, 0, 0, phase, start_date, end_date, event['hall_ids'], event['id'])
+            - suitable_lots = get_ranked_lots(event['hall_ids'], service_level='high', version=lots_version)
+            - assigned_cars, remaining_cars = assign_parking(suitable_lots, car_demand, 0, 0, phase, start_date, end_date, event['hall_ids'], event['id'], ranked=True)
             - phase_recommendations['cars'] = assigned_cars['cars']
             - if remaining_cars['cars'] > 0:
                 - status_message = f"Allocated within capacities, but missing capacities for {remaining_cars['cars']} car units"
         - if truck_demand > 0:
-            - suitable_lots = get_parking_lots()
-            - assigned_trucks, remaining_trucks = assign_parking(suitable_lots, 0, 0, truck_demand, phase, start_date, end_date, event['hall_ids'], event['id'])
+            - suitable_lots = get_ranked_lots(event['hall_ids'], version=lots_version)
+            - assigned_trucks, remaining_trucks = assign_parking(suitable_lots, 0, 0, truck_demand, phase, start_date, end_date, event['hall_ids'], event['id'], ranked=True)
             - phase_recommendations['trucks'] = assigned_trucks['trucks']
             - if remaining_trucks['trucks'] > 0:
                 - status_message = f"Allocated within capacities, but missing capacities for {remaining_trucks['trucks']} truck units"
+        - these passes live in recommend_phase, which allocate_event_day reuses for single-day re-allocation
     d) Update recommendations with assigned lots and status messages
         - recommendations[phase] = phase_recommendations
         - recommendations[phase]['status'] = status_message
     e) Return recommendations
         - return recommendations
+    f) With engine="flow", each phase is solved in one pass by assign_parking_flow
+        - vehicle classes -> lots as a min-cost max-flow in capacity units (1 per car, 3 per bus, 4 per truck)
+        - bus_limit / truck_limit cap the class -> lot edges, costs are average distances per vehicle
+        - the greedy rules become costs: cars to lots other than service_level "high" and trucks to lots
+          other than lot 5 pay a penalty above every distance, so the preferred lots fill first
+        - bus and truck flows are rounded down to whole vehicles and the remainder is placed greedily by distance
 
 9. Adjust capacities in recommendations for buses and trucks
     a) Define the adjust_recommendations function
@@ -199,8 +206,9 @@ Credits: Timon Tirtey (LMU), Sven Tiefenthaler (LMU)
 
 10. Create a Flask route to get recommendations
     a) Define the get_recommendations route
-    b) Extract event ID from the request
+    b) Extract event ID and engine ("greedy" or "flow") from the request
         - event_id = request.json.get("id")
+        - engine = request.json.get("engine", "greedy")
     c) Fetch event and entrance data from the database
         - event = db.session.execute(text(event_query), {"event_id": event_id}).fetchone()
         - entrance = db.session.execute(text(entrance_query), {"event_id": event_id}).fetchone()
@@ -217,6 +225,11 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from extensions import db
 from sqlalchemy import text
+from utils.cache import TTLCache
+from utils.capacity import CapacityLedger
+from utils.distances import get_distance_matrix
+from utils.helpers import get_data_version
+from utils.min_cost_flow import MinCostFlow
 import logging
 
 # Setup logging configuration
@@ -225,126 +238,11 @@ logger = logging.getLogger(__name__)
 
 recommendation_bp = Blueprint("recommendation", __name__)
 
-# Define distances data
-data = """
-1,1,370
-1,2,767
-1,3,900
-1,4,1010
-1,5,1370
-1,6,1436
-1,7,1840
-1,8,1920
-1,9,2000
-1,10,2086
-1,11,962
-1,12,982
-1,13,1050
-1,14,1120
-1,15,1210
-1,16,1370
-1,17,1460
-1,18,1620
-1,19,1670
-1,20,1830
-2,1,120
-2,2,472
-2,3,574
-2,4,566
-2,5,918
-2,6,1012
-2,7,1430
-2,8,1490
-2,9,1570
-2,10,1640
-2,11,545
-2,12,540
-2,13,622
-2,14,695
-2,15,790
-2,16,890
-2,17,970
-2,18,1050
-2,19,1140
-2,20,1420
-3,1,631
-3,2,50
-3,3,50
-3,4,171
-3,5,526
-3,6,597
-3,7,1000
-3,8,1080
-3,9,1160
-3,10,1240
-3,11,143
-3,12,151
-3,13,213
-3,14,280
-3,15,540
-3,16,611
-3,17,650
-3,18,742
-3,19,750
-3,20,997
-4,1,946
-4,2,378
-4,3,270
-4,4,151
-4,5,180
-4,6,261
-4,7,658
-4,8,736
-4,9,812
-4,10,896
-4,11,485
-4,12,365
-4,13,265
-4,14,221
-4,15,226
-4,16,209
-4,17,294
-4,18,325
-4,19,439
-4,20,680
-5,1,1320
-5,2,760
-5,3,606
-5,4,530
-5,5,153
-5,6,175
-5,7,187
-5,8,283
-5,9,354
-5,10,446
-5,11,963
-5,12,947
-5,13,755
-5,14,687
-5,15,682
-5,16,667
-5,17,635
-5,18,560
-5,19,552
-5,20,739
-"""
-
 # Define the list of west halls for parking house hard assignment
 west_halls = [1, 2, 3, 7, 8, 9, 13, 14, 15]
 
-# Split the raw data string into lines and then into individual values
-lines = data.strip().split("\n")
-values = [line.split(",") for line in lines]
-
-# Create a DataFrame from the values
-distances_df = pd.DataFrame(
-    values, columns=["entrance_id", "parking_lot_id", "distance"]
-)
-# Convert the columns to the appropriate data types
-distances_df["entrance_id"] = distances_df["entrance_id"].astype(int)
-distances_df["parking_lot_id"] = distances_df["parking_lot_id"].astype(int)
-distances_df["distance"] = distances_df["distance"].astype(int)
-
+# Sorted (lot, average distance) pairs per (hall set, service level, material, lots data version)
+ranked_lots_cache = TTLCache(maxsize=512, ttl=24 * 3600)
 
 
 def get_parking_lots(material=None, service_level=None):
@@ -390,79 +288,58 @@ def get_parking_lots(material=None, service_level=None):
 
 
 def get_average_distance(hall_ids, parking_lot_id):
-    distances = distances_df[
-        (distances_df["entrance_id"].isin(hall_ids))
-        & (distances_df["parking_lot_id"] == parking_lot_id)
+    return get_distance_matrix().average_distance(hall_ids, parking_lot_id)
+
+
+def rank_lots(lots, hall_ids, distance_matrix=None):
+    """(lot, average distance) pairs in assignment order: lot 20 first for west halls, then by distance and id."""
+    if distance_matrix is None:
+        distance_matrix = get_distance_matrix()
+    prioritize_20 = any(hall in west_halls for hall in hall_ids)
+    lots_with_distances = [
+        (lot, distance_matrix.average_distance(hall_ids, lot["id"])) for lot in lots
     ]
-    if not distances.empty:
-        average_distance = distances["distance"].mean()
-    else:
-        average_distance = float("inf")
-    return average_distance
-
-
-def fetch_parking_capacities(parking_lot_ids, start_date, end_date, event_id):
-
-    query = f"""
-    WITH date_series AS (
-        SELECT generate_series('{start_date}'::date, '{end_date}'::date, '1 day'::interval) AS date
-    ),
-    capacity_data AS (
-        SELECT
-            ds.date,
-            pc.parking_lot_id,
-            pc.capacity - COALESCE(SUM(pa.allocated_capacity) FILTER (WHERE pa.event_id != {event_id}), 0) AS free_capacity,
-            LEAST(
-                (pc.capacity - COALESCE(SUM(pa.allocated_capacity) FILTER (WHERE pa.event_id != {event_id}), 0)) / 4,
-                pc.truck_limit - COALESCE(SUM(pa.allocated_trucks) FILTER (WHERE pa.event_id != {event_id}), 0)
-            ) AS available_truck_units,
-            LEAST(
-                (pc.capacity - COALESCE(SUM(pa.allocated_capacity) FILTER (WHERE pa.event_id != {event_id}), 0)) / 3,
-                pc.bus_limit - COALESCE(SUM(pa.allocated_buses) FILTER (WHERE pa.event_id != {event_id}), 0)
-            ) AS available_bus_units
-        FROM
-            date_series ds
-        LEFT JOIN
-            public.parking_lot_capacity pc
-            ON ds.date BETWEEN pc.valid_from AND pc.valid_to
-        LEFT JOIN
-            public.parking_lot_allocation pa
-            ON pc.parking_lot_id = pa.parking_lot_id
-            AND ds.date = pa.date
-        WHERE
-            pc.parking_lot_id IN ({','.join(map(str, parking_lot_ids))})
-        GROUP BY
-            ds.date, pc.parking_lot_id, pc.capacity, pc.truck_limit, pc.bus_limit
-    ),
-    min_values AS (
-        SELECT
-            parking_lot_id,
-            MIN(free_capacity) AS min_free_capacity,
-            MIN(available_truck_units) AS min_truck_units,
-            MIN(available_bus_units) AS min_bus_units
-        FROM
-            capacity_data
-        GROUP BY
-            parking_lot_id
-    )
-    SELECT
-        parking_lot_id,
-        min_free_capacity,
-        min_truck_units,
-        min_bus_units
-    FROM
-        min_values;
+    if prioritize_20:
+        return sorted(
+            lots_with_distances, key=lambda x: (x[0]["id"] != 20, x[1], x[0]["id"])
+        )
+    return sorted(lots_with_distances, key=lambda x: (x[1], x[0]["id"]))
+
+
+def get_ranked_lots(hall_ids, service_level=None, material=None, version=None):
+    """
+    rank_lots over get_parking_lots(material, service_level), cached per hall set, service level and material.
+    The key includes the 'lots' data version, which moves with every write to parking_lot or
+    entrance_parking_lot_distance. Pass version to read it once per run instead of once per call.
+    The cached pairs are shared, callers must not modify them.
     """
-    result = db.session.execute(text(query)).fetchall()
-    capacities = {row[0]: row[1:] for row in result}
+    if version is None:
+        version = get_data_version("lots")[0]
+    key = (frozenset(hall_ids), service_level, material, version)
+    lots_sorted = ranked_lots_cache.get(key)
+    if lots_sorted is None:
+        lots = get_parking_lots(material=material, service_level=service_level)
+        if isinstance(lots, str):
+            return lots
+        lots_sorted = tuple(rank_lots(lots, hall_ids, get_distance_matrix(version)))
+        ranked_lots_cache.set(key, lots_sorted)
+    return lots_sorted
+
+
+def fetch_parking_capacities(parking_lot_ids, start_date, end_date, event_id, ledger=None):
+    if ledger is None:
+        ledger = CapacityLedger.load(start_date, end_date)
+    capacities = ledger.min_free(
+        parking_lot_ids, start_date, end_date, exclude_event_id=event_id
+    )
     return capacities
 
 
-def prepare_capacity_data(lots, start_date, end_date, event_id):
+def prepare_capacity_data(lots, start_date, end_date, event_id, ledger=None):
 
     parking_lot_ids = [lot["id"] for lot in lots]
     capacities = fetch_parking_capacities(
-        parking_lot_ids, start_date, end_date, event_id
+        parking_lot_ids, start_date, end_date, event_id, ledger
     )
     capacity_data = []
     for lot in lots:
@@ -477,20 +354,34 @@ def prepare_capacity_data(lots, start_date, end_date, event_id):
                     "prio_weighting": 0,  
                 }
             )
-    capacity_df = pd.DataFrame(capacity_data)
+    capacity_df = pd.DataFrame(
+        capacity_data,
+        columns=[
+            "parking_lot_id",
+            "remaining_free_capacity",
+            "bus_limit",
+            "truck_limit",
+            "prio_weighting",
+        ],
+    )
     return capacity_df
 
 
 def calculate_priority(df, hall_ids):
-    df["average_distance"] = df["parking_lot_id"].apply(
-        lambda lot_id: get_average_distance(hall_ids, lot_id)
+    distance_matrix = get_distance_matrix()
+    average_by_lot = dict(
+        zip(
+            distance_matrix.parking_lot_ids,
+            distance_matrix.average_distances(hall_ids),
+        )
+    )
+    df["average_distance"] = (
+        df["parking_lot_id"].map(average_by_lot).fillna(float("inf"))
     )
 
     # Berechnung der Prioritätsgewichtung als Kombination aus durchschnittlicher Entfernung und umgekehrter Kapazität
-    df["prio_weighting"] = df.apply(
-        lambda row: row["average_distance"]
-        + (1000 / (row["remaining_free_capacity"] + 1)),
-        axis=1,
+    df["prio_weighting"] = df["average_distance"] + (
+        1000 / (df["remaining_free_capacity"] + 1)
     )
 
     return df
@@ -506,29 +397,18 @@ def assign_parking(
     end_date,
     hall_ids,
     event_id,
+    ledger=None,
+    ranked=False,
 ):
     assigned_lots = {"cars": [], "buses": [], "trucks": []}
     remaining_demand = {"cars": car_demand, "buses": bus_demand, "trucks": truck_demand}
 
-    # Determine if any halls in the event belong to west halls
-    prioritize_20 = any(hall in west_halls for hall in hall_ids)
-
-    # Calculate average distances for all lots
-    lots_with_distances = [
-        (lot, get_average_distance(hall_ids, lot["id"])) for lot in lots
-    ]
-
-    # Sort the lots by distance and by ID if prioritize_20 is True
-    if prioritize_20:
-        lots_sorted = sorted(
-            lots_with_distances, key=lambda x: (x[0]["id"] != 20, x[1], x[0]["id"])
-        )
-    else:
-        lots_sorted = sorted(lots_with_distances, key=lambda x: (x[1], x[0]["id"]))
+    # Lots from get_ranked_lots are already sorted (lot 20 first for west halls, then by distance and ID)
+    lots_sorted = lots if ranked else rank_lots(lots, hall_ids)
 
     # Prepare capacity data
     capacity_df = prepare_capacity_data(
-        [lot[0] for lot in lots_sorted], start_date, end_date, event_id
+        [lot[0] for lot in lots_sorted], start_date, end_date, event_id, ledger
     )
 
     # Calculate priority based on distances and remaining capacity
@@ -600,9 +480,246 @@ def assign_parking(
     return assigned_lots, remaining_demand
 
 
-def recommendation_engine(event):
+VEHICLE_UNITS = {"cars": 1, "buses": 3, "trucks": 4}
+
+
+def assign_parking_flow(
+    lots,
+    car_demand,
+    bus_demand,
+    truck_demand,
+    phase,
+    start_date,
+    end_date,
+    hall_ids,
+    event_id,
+    ledger=None,
+):
+    demand = {"cars": car_demand, "buses": bus_demand, "trucks": truck_demand}
+    assigned_lots = {"cars": [], "buses": [], "trucks": []}
+
+    capacities = fetch_parking_capacities(
+        [lot["id"] for lot in lots], start_date, end_date, event_id, ledger
+    )
+    distance_matrix = get_distance_matrix()
+    prioritize_20 = any(hall in west_halls for hall in hall_ids)
+
+    lot_ids = [lot["id"] for lot in lots if lot["id"] in capacities]
+    distances = {
+        lot_id: distance_matrix.average_distance(hall_ids, lot_id) for lot_id in lot_ids
+    }
+    finite = [d for d in distances.values() if d != float("inf")]
+    unknown_distance = (max(finite) if finite else 1) * 10
+    for lot_id in lot_ids:
+        if prioritize_20 and lot_id == 20:
+            distances[lot_id] = 0
+        elif distances[lot_id] == float("inf"):
+            distances[lot_id] = unknown_distance
+    lot_ids.sort(key=lambda lot_id: (distances[lot_id], lot_id))
+
+    # The greedy engine's hard rules as costs: cars prefer high service level lots and trucks lot 5.
+    # Any other lot costs more than every preferred one, so it is only used once those are full.
+    preferred = {
+        "cars": {lot["id"] for lot in lots if lot.get("pricing") == "high"},
+        "buses": None,
+        "trucks": {5},
+    }
+    costs = {
+        vehicle: {
+            lot_id: distances[lot_id]
+            + (
+                unknown_distance
+                if preferred[vehicle] is not None and lot_id not in preferred[vehicle]
+                else 0
+            )
+            for lot_id in lot_ids
+        }
+        for vehicle in VEHICLE_UNITS
+    }
+
+    free = {lot_id: max(capacities[lot_id][0], 0) for lot_id in lot_ids}
+    limits = {
+        "cars": {lot_id: free[lot_id] for lot_id in lot_ids},
+        "buses": {lot_id: max(capacities[lot_id][2], 0) for lot_id in lot_ids},
+        "trucks": {lot_id: max(capacities[lot_id][1], 0) for lot_id in lot_ids},
+    }
+
+    # Network in capacity units: source -> vehicle class -> parking lot -> sink.
+    # Cost per unit is distance / unit weight, so the total cost is the walking distance per vehicle.
+    vehicles = list(VEHICLE_UNITS)
+    source, sink = 0, len(vehicles) + len(lot_ids) + 1
+    network = MinCostFlow(sink + 1)
+    class_lot_edges = {}
+    for c, vehicle in enumerate(vehicles, start=1):
+        units = VEHICLE_UNITS[vehicle]
+        network.add_edge(source, c, demand[vehicle] * units, 0)
+        for l, lot_id in enumerate(lot_ids, start=len(vehicles) + 1):
+            capacity = min(limits[vehicle][lot_id], free[lot_id] // units) * units
+            if capacity > 0:
+                class_lot_edges[(vehicle, lot_id)] = network.add_edge(
+                    c, l, capacity, costs[vehicle][lot_id] / units
+                )
+    for l, lot_id in enumerate(lot_ids, start=len(vehicles) + 1):
+        network.add_edge(l, sink, free[lot_id], 0)
+    network.solve(source, sink)
+
+    # Round bus and truck flows down to whole vehicles, then place the rest greedily by cost
+    allocated = {vehicle: {} for vehicle in vehicles}
+    remaining_demand = dict(demand)
+    for (vehicle, lot_id), edge in class_lot_edges.items():
+        count = network.flow(edge) // VEHICLE_UNITS[vehicle]
+        if count > 0:
+            allocated[vehicle][lot_id] = count
+            remaining_demand[vehicle] -= count
+            free[lot_id] -= count * VEHICLE_UNITS[vehicle]
+            limits[vehicle][lot_id] -= count
+
+    for vehicle in ["trucks", "buses", "cars"]:
+        units = VEHICLE_UNITS[vehicle]
+        for lot_id in sorted(lot_ids, key=lambda lot_id: (costs[vehicle][lot_id], lot_id)):
+            if remaining_demand[vehicle] <= 0:
+                break
+            count = min(
+                remaining_demand[vehicle], free[lot_id] // units, limits[vehicle][lot_id]
+            )
+            if count > 0:
+                allocated[vehicle][lot_id] = allocated[vehicle].get(lot_id, 0) + count
+                remaining_demand[vehicle] -= count
+                free[lot_id] -= count * units
+                limits[vehicle][lot_id] -= count
+
+    for vehicle in vehicles:
+        for lot_id in lot_ids:
+            if allocated[vehicle].get(lot_id):
+                assigned_lots[vehicle].append(
+                    {
+                        "parking_lot_id": lot_id,
+                        "capacity": allocated[vehicle][lot_id] * VEHICLE_UNITS[vehicle],
+                    }
+                )
+
+    return assigned_lots, remaining_demand
+
+
+ENGINES = {"greedy": assign_parking, "flow": assign_parking_flow}
+
+
+def recommend_phase(
+    event_id,
+    hall_ids,
+    phase,
+    start_date,
+    end_date,
+    car_demand,
+    bus_demand,
+    truck_demand,
+    ledger,
+    lots_version,
+):
+    """
+    Greedy recommendation for one phase: cars on high service level lots, trucks on lot 5,
+    then all demand over every ranked lot. Returns the phase dict with its status, or an
+    error string when the parking lots cannot be fetched.
+    """
+    phase_recommendations = {"cars": [], "buses": [], "trucks": []}
+    status_message = "ok"
+
+    if car_demand > 0:
+        suitable_lots = get_ranked_lots(
+            hall_ids, service_level="high", version=lots_version
+        )
+        if isinstance(suitable_lots, str):
+            logger.error(f"Error fetching parking lots: {suitable_lots}")
+            return f"Error fetching parking lots: {suitable_lots}"
+        assigned_cars, remaining_cars = assign_parking(
+            suitable_lots,
+            car_demand,
+            0,
+            0,
+            phase,
+            start_date,
+            end_date,
+            hall_ids,
+            event_id,
+            ledger,
+            ranked=True,
+        )
+        phase_recommendations["cars"] = assigned_cars["cars"]
+
+        if remaining_cars["cars"] > 0:
+            status_message = f"Allocated within capacities, but missing capacities for {remaining_cars['cars']} car units"
+
+    if truck_demand > 0:
+        remaining_truck_demand = truck_demand
+        assigned_trucks, remaining_trucks = assign_parking(
+            [{"id": 5}],
+            0,
+            0,
+            truck_demand,
+            phase,
+            start_date,
+            end_date,
+            hall_ids,
+            event_id,
+            ledger,
+        )
+        phase_recommendations["trucks"] = assigned_trucks["trucks"]
+        if remaining_truck_demand > 0:
+            suitable_lots = get_ranked_lots(hall_ids, version=lots_version)
+            if isinstance(suitable_lots, str):
+                logger.error(f"Error fetching parking lots: {suitable_lots}")
+                return f"Error fetching parking lots: {suitable_lots}"
+            additional_trucks, remaining_trucks = assign_parking(
+                suitable_lots,
+                0,
+                0,
+                remaining_truck_demand,
+                phase,
+                start_date,
+                end_date,
+                hall_ids,
+                event_id,
+                ledger,
+                ranked=True,
+            )
+            phase_recommendations["trucks"].extend(additional_trucks["trucks"])
+
+        if remaining_trucks["trucks"] > 0:
+            status_message = f"Allocated within capacities, but missing capacities for {remaining_trucks['trucks']} truck units"
+
+    suitable_lots = get_ranked_lots(hall_ids, version=lots_version)
+    if isinstance(suitable_lots, str):
+        logger.error(f"Error fetching parking lots: {suitable_lots}")
+        return f"Error fetching parking lots: {suitable_lots}"
+    assigned_all, remaining_all = assign_parking(
+        suitable_lots,
+        car_demand,
+        bus_demand,
+        truck_demand,
+        phase,
+        start_date,
+        end_date,
+        hall_ids,
+        event_id,
+        ledger,
+        ranked=True,
+    )
+    phase_recommendations.update(assigned_all)
+
+    phase_recommendations["status"] = status_message
+    return phase_recommendations
+
+
+def recommendation_engine(event, ledger=None, engine="greedy", lots_version=None):
     recommendations = {}
     phases = ["assembly", "runtime", "disassembly"]
+    if lots_version is None:
+        lots_version = get_data_version("lots")[0]
+    if ledger is None:
+        ledger = CapacityLedger.load(
+            min(event[f"{phase}_start_date"] for phase in phases),
+            max(event[f"{phase}_end_date"] for phase in phases),
+        )
     for phase in phases:
         try:
             start_date = event[f"{phase}_start_date"]
@@ -614,85 +731,51 @@ def recommendation_engine(event):
             phase_recommendations = {"cars": [], "buses": [], "trucks": []}
             status_message = "ok"
 
-            if car_demand > 0:
-                hall_ids_set = set(event["hall_ids"])
-                suitable_lots = get_parking_lots(service_level="high")
+            if engine == "flow":
+                suitable_lots = get_ranked_lots(event["hall_ids"], version=lots_version)
                 if isinstance(suitable_lots, str):
                     logger.error(f"Error fetching parking lots: {suitable_lots}")
                     return f"Error fetching parking lots: {suitable_lots}"
-                assigned_cars, remaining_cars = assign_parking(
-                    suitable_lots,
+                assigned_all, remaining_all = assign_parking_flow(
+                    [lot for lot, _ in suitable_lots],
                     car_demand,
-                    0,
-                    0,
-                    phase,
-                    start_date,
-                    end_date,
-                    event["hall_ids"],
-                    event["id"],
-                )
-                phase_recommendations["cars"] = assigned_cars["cars"]
-
-                if remaining_cars["cars"] > 0:
-                    status_message = f"Allocated within capacities, but missing capacities for {remaining_cars['cars']} car units"
-
-            if truck_demand > 0:
-                remaining_truck_demand = truck_demand
-                assigned_trucks, remaining_trucks = assign_parking(
-                    [{"id": 5}],
-                    0,
-                    0,
+                    bus_demand,
                     truck_demand,
                     phase,
                     start_date,
                     end_date,
                     event["hall_ids"],
                     event["id"],
+                    ledger,
                 )
-                phase_recommendations["trucks"] = assigned_trucks["trucks"]
-                if remaining_truck_demand > 0:
-                    suitable_lots = get_parking_lots()
-                    if isinstance(suitable_lots, str):
-                        logger.error(f"Error fetching parking lots: {suitable_lots}")
-                        return f"Error fetching parking lots: {suitable_lots}"
-                    additional_trucks, remaining_trucks = assign_parking(
-                        suitable_lots,
-                        0,
-                        0,
-                        remaining_truck_demand,
-                        phase,
-                        start_date,
-                        end_date,
-                        event["hall_ids"],
-                        event["id"],
-                    )
-                    phase_recommendations["trucks"].extend(additional_trucks["trucks"])
-
-                if remaining_trucks["trucks"] > 0:
-                    status_message = f"Allocated within capacities, but missing capacities for {remaining_trucks['trucks']} truck units"
-
-            suitable_lots = get_parking_lots()
-            if isinstance(suitable_lots, str):
-                logger.error(f"Error fetching parking lots: {suitable_lots}")
-                return f"Error fetching parking lots: {suitable_lots}"
-            assigned_all, remaining_all = assign_parking(
-                suitable_lots,
-                car_demand,
-                bus_demand,
-                truck_demand,
+                phase_recommendations.update(assigned_all)
+                missing = [
+                    f"{remaining_all[vehicle]} {label} units"
+                    for vehicle, label in [("cars", "car"), ("buses", "bus"), ("trucks", "truck")]
+                    if remaining_all[vehicle] > 0
+                ]
+                if missing:
+                    status_message = f"Allocated within capacities, but missing capacities for {', '.join(missing)}"
+                recommendations[phase] = phase_recommendations
+                recommendations[phase]["status"] = status_message
+                continue
+
+            phase_recommendations = recommend_phase(
+                event["id"],
+                event["hall_ids"],
                 phase,
                 start_date,
                 end_date,
-                event["hall_ids"],
-                event["id"],
+                car_demand,
+                bus_demand,
+                truck_demand,
+                ledger,
+                lots_version,
             )
-            phase_recommendations.update(assigned_all)
-
             if isinstance(phase_recommendations, str):
                 return phase_recommendations
 
             recommendations[phase] = phase_recommendations
-            recommendations[phase]["status"] = status_message
         except Exception as e:
             logger.error(
                 f"Error generating recommendations for phase {phase}: {str(e)}"
@@ -723,6 +806,9 @@ def get_recommendations():
         event_id = request.json.get("id")
         if not event_id:
             return jsonify({"error": "Event ID is required"}), 400
+        engine = request.json.get("engine", "greedy")
+        if engine not in ENGINES:
+            return jsonify({"error": f"Unknown engine '{engine}'"}), 400
 
         event_query = """
             SELECT 
@@ -778,7 +864,7 @@ def get_recommendations():
             "disassembly_demand_trucks": event.disassembly_demand_trucks,
         }
 
-        recommendations = recommendation_engine(event_data)
+        recommendations = recommendation_engine(event_data, engine=engine)
         recommendations_adjusted = adjust_recommendations(recommendations)
 
         return jsonify(recommendations_adjusted), 200
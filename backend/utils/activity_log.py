@@ -0,0 +1,266 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import click
+import requests
+from extensions import db
+from flask import current_app
+from flask.cli import with_appcontext
+from models import UserLog
+from sqlalchemy import text
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_LOCATION = "Unknown"
+
+
+class IpinfoResolver:
+    """Looks up "city, region, country" on ipinfo.io; network errors and timeouts resolve to Unknown."""
+
+    def __init__(self, timeout=2.0):
+        self.timeout = timeout
+
+    def __call__(self, ip_address):
+        try:
+            response = requests.get(
+                f"https://ipinfo.io/{ip_address}/json", timeout=self.timeout
+            )
+            if response.status_code == 200:
+                data = response.json()
+                city = data.get("city", "")
+                region = data.get("region", "")
+                country = data.get("country", "")
+                if city or region or country:
+                    return f"{city}, {region}, {country}".strip(", ")
+        except Exception as e:
+            logger.warning(f"Error fetching location: {e}")
+        return UNKNOWN_LOCATION
+
+
+class StubResolver:
+    """Fixed location without network access, for tests and local development."""
+
+    def __init__(self, location="Local"):
+        self.location = location
+
+    def __call__(self, ip_address):
+        return self.location
+
+
+class OfflineResolver:
+    def __call__(self, ip_address):
+        return UNKNOWN_LOCATION
+
+
+def create_resolver(mode=None):
+    """Resolver for GEOLOCATION_MODE: ipinfo (default), stub or offline."""
+    mode = (mode or os.getenv("GEOLOCATION_MODE", "ipinfo")).lower()
+    if mode == "stub":
+        return StubResolver()
+    if mode == "offline":
+        return OfflineResolver()
+    return IpinfoResolver(timeout=float(os.getenv("GEOLOCATION_TIMEOUT", "2")))
+
+
+class GeoLocator:
+    """Resolver behind a bounded LRU cache with TTL, keyed by IP address."""
+
+    def __init__(self, resolver, maxsize=4096, ttl=24 * 3600):
+        self.resolver = resolver
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def locate(self, ip_address):
+        if not ip_address:
+            return UNKNOWN_LOCATION
+        location = self.cache.get(ip_address)
+        if location is None:
+            location = self.resolver(ip_address) or UNKNOWN_LOCATION
+            self.cache.set(ip_address, location)
+        return location
+
+
+class UserLogWriter:
+    """
+    Buffers activity records in a bounded queue and writes them from a daemon thread with one
+    multi-row INSERT per flush. A flush happens once batch_size records are buffered or
+    flush_interval seconds after the first buffered record; close() flushes the rest on shutdown.
+    When the buffer is full, log() blocks for up to put_timeout seconds and then drops the record.
+    """
+
+    def __init__(
+        self, geolocator, batch_size=500, flush_interval=2.0, maxsize=10000, put_timeout=0.1
+    ):
+        self.geolocator = geolocator
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._app = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def log(self, user_name, email, ip_address, session_id, page_accessed):
+        record = {
+            "timestamp": datetime.utcnow(),
+            "user_name": user_name,
+            "email": email,
+            "ip_address": ip_address,
+            "session_id": session_id,
+            "page_accessed": page_accessed,
+        }
+        try:
+            self.queue.put(record, timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"User log buffer full, dropped entry ({self.dropped} so far)")
+            return
+        self._ensure_worker(current_app._get_current_object())
+
+    def _ensure_worker(self, app):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._app = app
+                self._thread = threading.Thread(
+                    target=self._run, name="user-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping.is_set():
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        with self._app.app_context():
+            try:
+                for record in batch:
+                    record["location"] = self.geolocator.locate(record["ip_address"])
+                self._write(batch)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} user log entries: {e}")
+            finally:
+                db.session.remove()
+
+    def _write(self, batch):
+        """Insert the batch; on failure bisect it so that only the offending records are lost."""
+        try:
+            # executemany of a Core insert is sent as multi-row INSERT ... VALUES batches
+            db.session.execute(UserLog.__table__.insert(), batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                logger.error(f"Error writing user log entry for {batch[0]['email']}: {e}")
+                return
+            middle = len(batch) // 2
+            self._write(batch[:middle])
+            self._write(batch[middle:])
+
+    def close(self, timeout=5.0):
+        """Stop the worker and write everything still buffered."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        remaining = self._drain()
+        for start in range(0, len(remaining), self.batch_size):
+            self._flush(remaining[start : start + self.batch_size])
+
+
+user_log_writer = UserLogWriter(
+    GeoLocator(create_resolver()),
+    batch_size=int(os.getenv("USER_LOG_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("USER_LOG_FLUSH_INTERVAL", "2")),
+    maxsize=int(os.getenv("USER_LOG_BUFFER_SIZE", "10000")),
+)
+atexit.register(user_log_writer.close)
+
+
+def log_user_activity(user_name, email, ip_address, session_id, page_accessed):
+    """Buffer an activity record; location lookup and the insert happen in the background."""
+    user_log_writer.log(user_name, email, ip_address, session_id, page_accessed)
+
+
+def rollup_user_log(retention_days=90):
+    """
+    Move user_log rows older than retention_days (cut at midnight UTC) into user_log_daily
+    page-view counts and delete them, in one statement. Returns the number of rolled up rows.
+    """
+    query = text(
+        """
+        WITH moved AS (
+            DELETE FROM public.user_log
+            WHERE timestamp < date_trunc('day', now() AT TIME ZONE 'UTC') - make_interval(days => :retention_days)
+            RETURNING timestamp, email, session_id, page_accessed
+        ),
+        daily AS (
+            SELECT
+                timestamp::date AS date,
+                page_accessed,
+                COUNT(*) AS views,
+                COUNT(DISTINCT email) AS unique_users,
+                COUNT(DISTINCT session_id) AS unique_sessions
+            FROM moved
+            GROUP BY timestamp::date, page_accessed
+        ),
+        inserted AS (
+            INSERT INTO public.user_log_daily (date, page_accessed, views, unique_users, unique_sessions)
+            SELECT date, page_accessed, views, unique_users, unique_sessions FROM daily
+            ON CONFLICT (date, page_accessed) DO UPDATE
+            SET views = user_log_daily.views + EXCLUDED.views,
+                unique_users = GREATEST(user_log_daily.unique_users, EXCLUDED.unique_users),
+                unique_sessions = GREATEST(user_log_daily.unique_sessions, EXCLUDED.unique_sessions)
+        )
+        SELECT COALESCE(SUM(views), 0) FROM daily
+        """
+    )
+    try:
+        rolled_up = db.session.execute(
+            query, {"retention_days": retention_days}
+        ).scalar()
+        db.session.commit()
+        return int(rolled_up)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@click.command("rollup-user-log")
+@click.option("--retention-days", default=90, show_default=True, type=int)
+@with_appcontext
+def rollup_user_log_command(retention_days):
+    """Aggregate old user_log rows into user_log_daily and delete them."""
+    rolled_up = rollup_user_log(retention_days)
+    click.echo(f"Rolled up {rolled_up} user_log rows older than {retention_days} days")
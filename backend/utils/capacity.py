@@ -0,0 +1,226 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from extensions import db
+from sqlalchemy import text
+from utils.helpers import parse_date
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return parse_date(str(value))
+
+
+def capacity_timeseries(start_date, end_date, lot_ids=None):
+    """
+    Total capacity per day over [start_date, end_date] as an int64 array (index 0 is start_date),
+    optionally restricted to lot_ids. Built as a difference array over the validity periods
+    (+capacity at valid_from, -capacity the day after valid_to) followed by one cumulative sum.
+    Queries that join capacity with other per-day rows in SQL (map timeline, event status)
+    read the trigger-maintained daily_lot_rollup instead.
+    """
+    start_date = to_date(start_date)
+    end_date = to_date(end_date)
+    days = (end_date - start_date).days + 1
+    if days <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Periods clipped to the window, as day offsets from start_date
+    query = """
+    SELECT GREATEST(valid_from, CAST(:start_date AS date)) - CAST(:start_date AS date) AS first,
+           LEAST(valid_to, CAST(:end_date AS date)) - CAST(:start_date AS date) + 1 AS stop,
+           capacity
+    FROM public.parking_lot_capacity
+    WHERE validity && daterange(CAST(:start_date AS date), CAST(:end_date AS date), '[]')
+    """
+    params = {"start_date": start_date, "end_date": end_date}
+    if lot_ids is not None:
+        query += " AND parking_lot_id = ANY(:lot_ids)"
+        params["lot_ids"] = list(lot_ids)
+    rows = db.session.execute(text(query), params).all()
+
+    delta = np.zeros(days + 1, dtype=np.int64)
+    if rows:
+        first, stop, capacity = (np.array(column, dtype=np.int64) for column in zip(*rows))
+        np.add.at(delta, first, capacity)
+        np.subtract.at(delta, stop, capacity)
+    return np.cumsum(delta[:-1])
+
+
+class CapacityLedger:
+    """
+    Dense (parking lot x day) view of parking_lot_capacity and parking_lot_allocation
+    for a fixed date window. Loaded with a single query and answered in memory.
+    """
+
+    def __init__(self, start_date, end_date, capacity_rows, allocation_rows):
+        self.start_date = to_date(start_date)
+        self.end_date = to_date(end_date)
+        self.days = (self.end_date - self.start_date).days + 1
+
+        lot_ids = sorted(
+            {row["parking_lot_id"] for row in capacity_rows}
+            | {row["parking_lot_id"] for row in allocation_rows}
+        )
+        self.lot_index = {lot_id: i for i, lot_id in enumerate(lot_ids)}
+        shape = (len(lot_ids), self.days)
+
+        self.covered = np.zeros(shape, dtype=bool)
+        self.capacity = np.zeros(shape, dtype=np.int64)
+        self.truck_limit = np.zeros(shape, dtype=np.int64)
+        self.bus_limit = np.zeros(shape, dtype=np.int64)
+        self.allocated_capacity = np.zeros(shape, dtype=np.int64)
+        self.allocated_trucks = np.zeros(shape, dtype=np.int64)
+        self.allocated_buses = np.zeros(shape, dtype=np.int64)
+        # event_id -> {(lot index, day index): [capacity, trucks, buses]}
+        self.event_cells = {}
+
+        for row in capacity_rows:
+            first, last = self._clip(row["valid_from"], row["valid_to"])
+            if first > last:
+                continue
+            lot = self.lot_index[row["parking_lot_id"]]
+            self.covered[lot, first : last + 1] = True
+            self.capacity[lot, first : last + 1] = row["capacity"]
+            self.truck_limit[lot, first : last + 1] = row["truck_limit"]
+            self.bus_limit[lot, first : last + 1] = row["bus_limit"]
+
+        for row in allocation_rows:
+            self.allocate(
+                row["event_id"],
+                row["parking_lot_id"],
+                row["date"],
+                capacity=row["allocated_capacity"],
+                trucks=row["allocated_trucks"],
+                buses=row["allocated_buses"],
+            )
+
+    @classmethod
+    def load(cls, start_date, end_date):
+        query = """
+        SELECT 'capacity' AS kind, parking_lot_id, NULL::integer AS event_id,
+               valid_from, valid_to, capacity, truck_limit, bus_limit
+        FROM public.parking_lot_capacity
+        WHERE validity && daterange(CAST(:start_date AS date), CAST(:end_date AS date), '[]')
+        UNION ALL
+        SELECT 'allocation' AS kind, parking_lot_id, event_id,
+               date, date, allocated_capacity, allocated_trucks, allocated_buses
+        FROM public.parking_lot_allocation
+        WHERE date BETWEEN :start_date AND :end_date
+        """
+        start_date = to_date(start_date)
+        end_date = to_date(end_date)
+        result = db.session.execute(
+            text(query), {"start_date": start_date, "end_date": end_date}
+        ).mappings()
+
+        capacity_rows = []
+        allocation_rows = []
+        for row in result:
+            if row["kind"] == "capacity":
+                capacity_rows.append(row)
+            else:
+                allocation_rows.append(
+                    {
+                        "event_id": row["event_id"],
+                        "parking_lot_id": row["parking_lot_id"],
+                        "date": row["valid_from"],
+                        "allocated_capacity": row["capacity"],
+                        "allocated_trucks": row["truck_limit"],
+                        "allocated_buses": row["bus_limit"],
+                    }
+                )
+        return cls(start_date, end_date, capacity_rows, allocation_rows)
+
+    def _clip(self, first, last):
+        first = max((to_date(first) - self.start_date).days, 0)
+        last = min((to_date(last) - self.start_date).days, self.days - 1)
+        return first, last
+
+    def date_of(self, day_index):
+        return self.start_date + timedelta(days=day_index)
+
+    def allocate(self, event_id, parking_lot_id, day, cars=0, trucks=0, buses=0, capacity=None):
+        """Book an allocation into the ledger; capacity defaults to cars + 4 * trucks + 3 * buses."""
+        if capacity is None:
+            capacity = cars + 4 * trucks + 3 * buses
+        if parking_lot_id not in self.lot_index:
+            return
+        day_index = (to_date(day) - self.start_date).days
+        if not 0 <= day_index < self.days:
+            return
+        lot = self.lot_index[parking_lot_id]
+        self.allocated_capacity[lot, day_index] += capacity
+        self.allocated_trucks[lot, day_index] += trucks
+        self.allocated_buses[lot, day_index] += buses
+
+        cell = self.event_cells.setdefault(event_id, {}).setdefault(
+            (lot, day_index), [0, 0, 0]
+        )
+        cell[0] += capacity
+        cell[1] += trucks
+        cell[2] += buses
+
+    def release(self, event_id, start_date=None, end_date=None):
+        """Remove an event's allocations from the ledger, optionally only within [start_date, end_date]."""
+        cells = self.event_cells.get(event_id, {})
+        first, last = 0, self.days - 1
+        if start_date is not None:
+            first, last = self._clip(start_date, end_date or start_date)
+        for (lot, day_index) in list(cells):
+            if not first <= day_index <= last:
+                continue
+            capacity, trucks, buses = cells.pop((lot, day_index))
+            self.allocated_capacity[lot, day_index] -= capacity
+            self.allocated_trucks[lot, day_index] -= trucks
+            self.allocated_buses[lot, day_index] -= buses
+
+    def min_free(self, parking_lot_ids, start_date, end_date, exclude_event_id=None):
+        """
+        Minimum free capacity, truck units and bus units per parking lot over [start_date, end_date],
+        ignoring allocations of exclude_event_id. Lots without a capacity entry in the window are omitted.
+        Returns {parking_lot_id: (min_free_capacity, min_truck_units, min_bus_units)}.
+        """
+        first, last = self._clip(start_date, end_date)
+        if first > last:
+            return {}
+        ids = [lot_id for lot_id in parking_lot_ids if lot_id in self.lot_index]
+        if not ids:
+            return {}
+        rows = [self.lot_index[lot_id] for lot_id in ids]
+        window = slice(first, last + 1)
+
+        allocated = self.allocated_capacity[rows, window]
+        trucks = self.allocated_trucks[rows, window]
+        buses = self.allocated_buses[rows, window]
+        if exclude_event_id in self.event_cells:
+            position = {lot: i for i, lot in enumerate(rows)}
+            for (lot, day_index), cell in self.event_cells[exclude_event_id].items():
+                if lot in position and first <= day_index <= last:
+                    allocated[position[lot], day_index - first] -= cell[0]
+                    trucks[position[lot], day_index - first] -= cell[1]
+                    buses[position[lot], day_index - first] -= cell[2]
+
+        covered = self.covered[rows, window]
+        free = self.capacity[rows, window] - allocated
+        # Truncate towards zero like the SQL integer division, floor differs when free is negative
+        truck_units = np.minimum(
+            np.trunc(free / 4).astype(np.int64), self.truck_limit[rows, window] - trucks
+        )
+        bus_units = np.minimum(
+            np.trunc(free / 3).astype(np.int64), self.bus_limit[rows, window] - buses
+        )
+
+        sentinel = np.iinfo(np.int64).max
+        min_free = np.where(covered, free, sentinel).min(axis=1)
+        min_trucks = np.where(covered, truck_units, sentinel).min(axis=1)
+        min_buses = np.where(covered, bus_units, sentinel).min(axis=1)
+
+        return {
+            lot_id: (int(min_free[i]), int(min_trucks[i]), int(min_buses[i]))
+            for i, lot_id in enumerate(ids)
+            if covered[i].any()
+        }
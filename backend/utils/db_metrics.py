@@ -0,0 +1,77 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Counters for pool checkouts, their wait time and physical connects, shared by all threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_checkout(self, wait):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self):
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "checkouts": checkouts,
+                "connects": self.connects,
+                # Share of checkouts served by an already open connection
+                "reuse_rate": 1 - min(self.connects, checkouts) / checkouts
+                if checkouts
+                else None,
+                "checkout_wait_ms": {
+                    "total": self.wait_total * 1000,
+                    "avg": self.wait_total / checkouts * 1000 if checkouts else None,
+                    "max": self.wait_max * 1000,
+                },
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_checkout(time.perf_counter() - start)
+
+
+@event.listens_for(InstrumentedQueuePool, "connect")
+def _count_connect(dbapi_connection, connection_record):
+    pool_metrics.record_connect()
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = pool_metrics.snapshot()
+    if isinstance(pool, QueuePool):
+        status.update(
+            {
+                "pool_size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        )
+    return status
@@ -0,0 +1,81 @@
+import numpy as np
+from extensions import db
+from sqlalchemy import text
+
+
+class DistanceMatrix:
+    """
+    Entrance x parking lot distances from entrance_parking_lot_distance as a NumPy matrix.
+    Average distances per hall set are computed in one reduction and memoized per frozenset of ids.
+    """
+
+    def __init__(self, rows):
+        entrance_ids = sorted({row["entrance_id"] for row in rows})
+        self.parking_lot_ids = sorted({row["parking_lot_id"] for row in rows})
+        self.entrance_index = {entrance_id: i for i, entrance_id in enumerate(entrance_ids)}
+        self.lot_index = {lot_id: i for i, lot_id in enumerate(self.parking_lot_ids)}
+
+        self.distances = np.full((len(entrance_ids), len(self.parking_lot_ids)), np.nan)
+        for row in rows:
+            if row["distance"] is not None:
+                self.distances[
+                    self.entrance_index[row["entrance_id"]],
+                    self.lot_index[row["parking_lot_id"]],
+                ] = row["distance"]
+        self._averages = {}
+
+    @classmethod
+    def load(cls):
+        query = """
+        SELECT entrance_id, parking_lot_id, distance
+        FROM public.entrance_parking_lot_distance
+        """
+        rows = db.session.execute(text(query)).mappings().all()
+        return cls(rows)
+
+    def average_distances(self, hall_ids):
+        """Average distance per parking lot (ordered like parking_lot_ids), inf where no distance is known."""
+        key = frozenset(hall_ids)
+        if key not in self._averages:
+            rows = [self.entrance_index[i] for i in key if i in self.entrance_index]
+            selected = self.distances[rows]
+            counts = np.count_nonzero(~np.isnan(selected), axis=0)
+            sums = np.nansum(selected, axis=0)
+            averages = np.full(len(self.parking_lot_ids), np.inf)
+            np.divide(sums, counts, out=averages, where=counts > 0)
+            self._averages[key] = averages
+        return self._averages[key]
+
+    def average_distance(self, hall_ids, parking_lot_id):
+        index = self.lot_index.get(parking_lot_id)
+        if index is None:
+            return float("inf")
+        return float(self.average_distances(hall_ids)[index])
+
+
+_distance_matrix = None
+_distance_matrix_version = None
+
+
+def get_distance_matrix(version=None):
+    """Shared matrix; passing the current 'lots' data version reloads it once the distances changed."""
+    global _distance_matrix, _distance_matrix_version
+    if _distance_matrix is None or (
+        version is not None and version != _distance_matrix_version
+    ):
+        _distance_matrix = DistanceMatrix.load()
+        _distance_matrix_version = version
+    return _distance_matrix
+
+
+def set_distance_matrix(matrix, version):
+    """Install a matrix loaded elsewhere, e.g. one passed to a worker process."""
+    global _distance_matrix, _distance_matrix_version
+    _distance_matrix = matrix
+    _distance_matrix_version = version
+
+
+def invalidate_distance_matrix():
+    global _distance_matrix, _distance_matrix_version
+    _distance_matrix = None
+    _distance_matrix_version = None
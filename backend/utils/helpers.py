@@ -1,30 +1,10 @@
 import pandas as pd
 from datetime import datetime
+from decimal import Decimal
 from sqlalchemy import text
 from extensions import db
-from models import UserLog
-import requests
-import psycopg2
-from psycopg2.extras import DictCursor
-from urllib.parse import urlparse
-from flask import current_app
-import os
 
 
-def get_db_connection():
-    url = os.getenv("DATABASE_URL")
-    result = urlparse(url)
-    conn = psycopg2.connect(
-        dbname=result.path[1:],
-        user=result.username,
-        password=result.password,
-        host=result.hostname,
-        port=result.port,
-        sslmode='require',
-        cursor_factory=DictCursor
-    )
-    return conn
-
 def get_data(query, params=None):
     try:
         with db.engine.connect() as connection:
@@ -33,6 +13,29 @@ def get_data(query, params=None):
     except Exception as e:
         raise e
 
+def fetch_records(query, params=None):
+    """
+    Rows of a query as a list of JSON-serializable dicts, without building a DataFrame.
+    NUMERIC values become floats; dates, strings, arrays and NULLs (None) are passed through.
+    Use get_data only where the result is analysed with pandas.
+    """
+    with db.engine.connect() as connection:
+        result = connection.execute(text(query), params or {})
+        return [
+            {
+                key: float(value) if isinstance(value, Decimal) else value
+                for key, value in row.items()
+            }
+            for row in result.mappings()
+        ]
+
+def get_data_version(*scopes):
+    """Current data_version per scope as a tuple in the given order; 0 for scopes without a row."""
+    query = "SELECT scope, version FROM public.data_version WHERE scope IN :scopes"
+    rows = db.session.execute(text(query), {"scopes": tuple(scopes)}).all()
+    versions = {scope: version for scope, version in rows}
+    return tuple(versions.get(scope, 0) for scope in scopes)
+
 def parse_date(date_str):
     formats = ["%Y-%m-%d", "%a, %d %b %Y %H:%M:%S %Z"]
     for fmt in formats:
@@ -50,34 +53,3 @@ def calculate_date_range(start_date, end_date):
         date_array.append(current_date.strftime("%Y-%m-%d"))
         current_date += pd.DateOffset(days=1)
     return date_array
-
-
-def log_user_activity(user_name, email, ip_address, session_id, page_accessed):
-    location = get_location_from_ip(ip_address)
-    if not location.strip(", "):  
-        location = "Unknown"
-    user_log = UserLog(
-        user_name=user_name,
-        email=email,
-        ip_address=ip_address,
-        session_id=session_id,
-        location=location,
-        page_accessed=page_accessed
-    )
-    db.session.add(user_log)
-    db.session.commit()
-
-
-def get_location_from_ip(ip_address):
-    try:
-        response = requests.get(f"https://ipinfo.io/{ip_address}/json")
-        if response.status_code == 200:
-            data = response.json()
-            city = data.get("city", "")
-            region = data.get("region", "")
-            country = data.get("country", "")
-            if city or region or country:
-                return f"{city}, {region}, {country}".strip(", ")
-    except Exception as e:
-        print(f"Error fetching location: {e}")
-    return "Unknown"
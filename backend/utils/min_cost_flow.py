@@ -0,0 +1,67 @@
+from collections import deque
+
+
+class MinCostFlow:
+    """
+    Successive shortest path min-cost max-flow (SPFA on the residual graph).
+    Pure Python; meant for the small vehicle class -> parking lot networks of the recommendation engine.
+    """
+
+    def __init__(self, node_count):
+        self.graph = [[] for _ in range(node_count)]
+        self.edges = []
+
+    def add_edge(self, source, target, capacity, cost):
+        # Edge layout: [target, residual capacity, cost, index of reverse edge]
+        self.graph[source].append([target, capacity, cost, len(self.graph[target])])
+        self.graph[target].append([source, 0, -cost, len(self.graph[source]) - 1])
+        self.edges.append((source, len(self.graph[source]) - 1, capacity))
+        return len(self.edges) - 1
+
+    def flow(self, edge_id):
+        source, index, capacity = self.edges[edge_id]
+        return capacity - self.graph[source][index][1]
+
+    def solve(self, source, sink, max_flow=float("inf")):
+        total_flow = 0
+        total_cost = 0
+        node_count = len(self.graph)
+        while total_flow < max_flow:
+            distance = [float("inf")] * node_count
+            previous = [None] * node_count
+            in_queue = [False] * node_count
+            distance[source] = 0
+            queue = deque([source])
+            in_queue[source] = True
+            while queue:
+                node = queue.popleft()
+                in_queue[node] = False
+                for index, (target, capacity, cost, _) in enumerate(self.graph[node]):
+                    if capacity > 0 and distance[node] + cost < distance[target] - 1e-9:
+                        distance[target] = distance[node] + cost
+                        previous[target] = (node, index)
+                        if not in_queue[target]:
+                            queue.append(target)
+                            in_queue[target] = True
+
+            if previous[sink] is None:
+                break
+
+            bottleneck = max_flow - total_flow
+            node = sink
+            while node != source:
+                parent, index = previous[node]
+                bottleneck = min(bottleneck, self.graph[parent][index][1])
+                node = parent
+
+            node = sink
+            while node != source:
+                parent, index = previous[node]
+                edge = self.graph[parent][index]
+                edge[1] -= bottleneck
+                self.graph[node][edge[3]][1] += bottleneck
+                node = parent
+
+            total_flow += bottleneck
+            total_cost += bottleneck * distance[sink]
+        return total_flow, total_cost
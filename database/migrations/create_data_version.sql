@@ -0,0 +1,65 @@
+-- Data versions
+-- One counter per cache scope, bumped once per statement that writes a table of that scope.
+-- Application caches key on the current version, so any write invalidates them exactly.
+-- Run after create_tables.sql.
+
+CREATE TABLE IF NOT EXISTS public.data_version (
+    scope VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO public.data_version (scope) VALUES ('map'), ('geometry'), ('lots')
+ON CONFLICT (scope) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.data_version
+    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE scope = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- map: allocations, capacities, events and occupations shown on the map timeline
+CREATE TRIGGER trg_bump_data_version_parking_lot_allocation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.parking_lot_allocation
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('map');
+
+CREATE TRIGGER trg_bump_data_version_parking_lot_capacity
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.parking_lot_capacity
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('map');
+
+CREATE TRIGGER trg_bump_data_version_event
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.event
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('map');
+
+CREATE TRIGGER trg_bump_data_version_hall_occupation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.hall_occupation
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('map');
+
+CREATE TRIGGER trg_bump_data_version_entrance_occupation
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.entrance_occupation
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('map');
+
+-- geometry: names and coordinates of halls, parking lots and entrances
+CREATE TRIGGER trg_bump_data_version_hall
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.hall
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('geometry');
+
+CREATE TRIGGER trg_bump_data_version_parking_lot
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.parking_lot
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('geometry');
+
+CREATE TRIGGER trg_bump_data_version_entrance
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.entrance
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('geometry');
+
+-- lots: parking lot attributes and entrance distances behind the recommendation lot rankings
+CREATE TRIGGER trg_bump_data_version_lots_parking_lot
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.parking_lot
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('lots');
+
+CREATE TRIGGER trg_bump_data_version_lots_entrance_parking_lot_distance
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.entrance_parking_lot_distance
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('lots');
@@ -0,0 +1,223 @@
+-- Daily rollups
+-- Run after create_tables.sql and before create_views.sql.
+
+CREATE TABLE IF NOT EXISTS public.daily_lot_rollup (
+    date DATE NOT NULL,
+    parking_lot_id INTEGER NOT NULL REFERENCES public.parking_lot(id),
+    capacity INTEGER, -- NULL when no parking_lot_capacity entry covers the day
+    truck_limit INTEGER,
+    bus_limit INTEGER,
+    allocated_capacity INTEGER NOT NULL DEFAULT 0,
+    cars INTEGER NOT NULL DEFAULT 0,
+    trucks INTEGER NOT NULL DEFAULT 0,
+    buses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, parking_lot_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.daily_demand_rollup (
+    date DATE PRIMARY KEY,
+    demand INTEGER NOT NULL DEFAULT 0,
+    car_demand INTEGER NOT NULL DEFAULT 0,
+    truck_demand INTEGER NOT NULL DEFAULT 0,
+    bus_demand INTEGER NOT NULL DEFAULT 0,
+    entries INTEGER NOT NULL DEFAULT 0 -- number of visitor_demand rows on the day
+);
+
+CREATE INDEX IF NOT EXISTS idx_daily_lot_rollup_parking_lot_date ON public.daily_lot_rollup(parking_lot_id, date);
+
+-- Capacity: recompute the capacity columns of one lot for the affected validity window
+CREATE OR REPLACE FUNCTION refresh_daily_lot_rollup_capacity(p_parking_lot_id INTEGER, p_from DATE, p_to DATE) RETURNS VOID AS $$
+BEGIN
+    UPDATE public.daily_lot_rollup
+    SET capacity = NULL, truck_limit = NULL, bus_limit = NULL
+    WHERE parking_lot_id = p_parking_lot_id
+    AND date BETWEEN p_from AND p_to;
+
+    INSERT INTO public.daily_lot_rollup (date, parking_lot_id, capacity, truck_limit, bus_limit)
+    SELECT d.date::date, pc.parking_lot_id, SUM(pc.capacity), SUM(pc.truck_limit), SUM(pc.bus_limit)
+    FROM public.parking_lot_capacity pc
+    CROSS JOIN LATERAL generate_series(GREATEST(pc.valid_from, p_from), LEAST(pc.valid_to, p_to), '1 day'::interval) AS d(date)
+    WHERE pc.parking_lot_id = p_parking_lot_id
+    AND pc.validity && daterange(p_from, p_to, '[]')
+    GROUP BY d.date, pc.parking_lot_id
+    ON CONFLICT (date, parking_lot_id) DO UPDATE
+    SET capacity = EXCLUDED.capacity,
+        truck_limit = EXCLUDED.truck_limit,
+        bus_limit = EXCLUDED.bus_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_daily_lot_rollup_capacity() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM refresh_daily_lot_rollup_capacity(OLD.parking_lot_id, OLD.valid_from, OLD.valid_to);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_daily_lot_rollup_capacity(NEW.parking_lot_id, NEW.valid_from, NEW.valid_to);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Allocations: apply per-statement deltas from the transition tables
+CREATE OR REPLACE FUNCTION update_daily_lot_rollup_allocations() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO public.daily_lot_rollup (date, parking_lot_id, allocated_capacity, cars, trucks, buses)
+        SELECT date, parking_lot_id, SUM(allocated_capacity), SUM(allocated_cars), SUM(allocated_trucks), SUM(allocated_buses)
+        FROM new_allocations
+        GROUP BY date, parking_lot_id
+        ON CONFLICT (date, parking_lot_id) DO UPDATE
+        SET allocated_capacity = daily_lot_rollup.allocated_capacity + EXCLUDED.allocated_capacity,
+            cars = daily_lot_rollup.cars + EXCLUDED.cars,
+            trucks = daily_lot_rollup.trucks + EXCLUDED.trucks,
+            buses = daily_lot_rollup.buses + EXCLUDED.buses;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE public.daily_lot_rollup r
+        SET allocated_capacity = r.allocated_capacity - d.allocated_capacity,
+            cars = r.cars - d.cars,
+            trucks = r.trucks - d.trucks,
+            buses = r.buses - d.buses
+        FROM (
+            SELECT date, parking_lot_id, SUM(allocated_capacity) AS allocated_capacity, SUM(allocated_cars) AS cars,
+                   SUM(allocated_trucks) AS trucks, SUM(allocated_buses) AS buses
+            FROM old_allocations
+            GROUP BY date, parking_lot_id
+        ) d
+        WHERE r.date = d.date AND r.parking_lot_id = d.parking_lot_id;
+    ELSE
+        INSERT INTO public.daily_lot_rollup (date, parking_lot_id, allocated_capacity, cars, trucks, buses)
+        SELECT date, parking_lot_id, SUM(allocated_capacity), SUM(allocated_cars), SUM(allocated_trucks), SUM(allocated_buses)
+        FROM (
+            SELECT date, parking_lot_id, allocated_capacity, allocated_cars, allocated_trucks, allocated_buses
+            FROM new_allocations
+            UNION ALL
+            SELECT date, parking_lot_id, -allocated_capacity, -allocated_cars, -allocated_trucks, -allocated_buses
+            FROM old_allocations
+        ) delta
+        GROUP BY date, parking_lot_id
+        ON CONFLICT (date, parking_lot_id) DO UPDATE
+        SET allocated_capacity = daily_lot_rollup.allocated_capacity + EXCLUDED.allocated_capacity,
+            cars = daily_lot_rollup.cars + EXCLUDED.cars,
+            trucks = daily_lot_rollup.trucks + EXCLUDED.trucks,
+            buses = daily_lot_rollup.buses + EXCLUDED.buses;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Demand: apply per-statement deltas from the transition tables
+CREATE OR REPLACE FUNCTION update_daily_demand_rollup() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO public.daily_demand_rollup (date, demand, car_demand, truck_demand, bus_demand, entries)
+        SELECT date, SUM(demand), SUM(car_demand), SUM(truck_demand), SUM(bus_demand), COUNT(*)
+        FROM new_demands
+        GROUP BY date
+        ON CONFLICT (date) DO UPDATE
+        SET demand = daily_demand_rollup.demand + EXCLUDED.demand,
+            car_demand = daily_demand_rollup.car_demand + EXCLUDED.car_demand,
+            truck_demand = daily_demand_rollup.truck_demand + EXCLUDED.truck_demand,
+            bus_demand = daily_demand_rollup.bus_demand + EXCLUDED.bus_demand,
+            entries = daily_demand_rollup.entries + EXCLUDED.entries;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE public.daily_demand_rollup r
+        SET demand = r.demand - d.demand,
+            car_demand = r.car_demand - d.car_demand,
+            truck_demand = r.truck_demand - d.truck_demand,
+            bus_demand = r.bus_demand - d.bus_demand,
+            entries = r.entries - d.entries
+        FROM (
+            SELECT date, SUM(demand) AS demand, SUM(car_demand) AS car_demand, SUM(truck_demand) AS truck_demand,
+                   SUM(bus_demand) AS bus_demand, COUNT(*) AS entries
+            FROM old_demands
+            GROUP BY date
+        ) d
+        WHERE r.date = d.date;
+    ELSE
+        INSERT INTO public.daily_demand_rollup (date, demand, car_demand, truck_demand, bus_demand, entries)
+        SELECT date, SUM(demand), SUM(car_demand), SUM(truck_demand), SUM(bus_demand), SUM(entries)
+        FROM (
+            SELECT date, demand, car_demand, truck_demand, bus_demand, 1 AS entries
+            FROM new_demands
+            UNION ALL
+            SELECT date, -demand, -car_demand, -truck_demand, -bus_demand, -1
+            FROM old_demands
+        ) delta
+        GROUP BY date
+        ON CONFLICT (date) DO UPDATE
+        SET demand = daily_demand_rollup.demand + EXCLUDED.demand,
+            car_demand = daily_demand_rollup.car_demand + EXCLUDED.car_demand,
+            truck_demand = daily_demand_rollup.truck_demand + EXCLUDED.truck_demand,
+            bus_demand = daily_demand_rollup.bus_demand + EXCLUDED.bus_demand,
+            entries = daily_demand_rollup.entries + EXCLUDED.entries;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers
+DROP TRIGGER IF EXISTS trg_update_daily_lot_rollup_capacity ON public.parking_lot_capacity;
+CREATE TRIGGER trg_update_daily_lot_rollup_capacity
+AFTER INSERT OR UPDATE OR DELETE ON public.parking_lot_capacity
+FOR EACH ROW EXECUTE FUNCTION update_daily_lot_rollup_capacity();
+
+DROP TRIGGER IF EXISTS trg_update_daily_lot_rollup_allocations_insert ON public.parking_lot_allocation;
+CREATE TRIGGER trg_update_daily_lot_rollup_allocations_insert
+AFTER INSERT ON public.parking_lot_allocation
+REFERENCING NEW TABLE AS new_allocations
+FOR EACH STATEMENT EXECUTE FUNCTION update_daily_lot_rollup_allocations();
+
+DROP TRIGGER IF EXISTS trg_update_daily_lot_rollup_allocations_update ON public.parking_lot_allocation;
+CREATE TRIGGER trg_update_daily_lot_rollup_allocations_update
+AFTER UPDATE ON public.parking_lot_allocation
+REFERENCING OLD TABLE AS old_allocations NEW TABLE AS new_allocations
+FOR EACH STATEMENT EXECUTE FUNCTION update_daily_lot_rollup_allocations();
+
+DROP TRIGGER IF EXISTS trg_update_daily_lot_rollup_allocations_delete ON public.parking_lot_allocation;
+CREATE TRIGGER trg_update_daily_lot_rollup_allocations_delete
+AFTER DELETE ON public.parking_lot_allocation
+REFERENCING OLD TABLE AS old_allocations
+FOR EACH STATEMENT EXECUTE FUNCTION update_daily_lot_rollup_allocations();
+
+DROP TRIGGER IF EXISTS trg_update_daily_demand_rollup_insert ON public.visitor_demand;
+CREATE TRIGGER trg_update_daily_demand_rollup_insert
+AFTER INSERT ON public.visitor_demand
+REFERENCING NEW TABLE AS new_demands
+FOR EACH STATEMENT EXECUTE FUNCTION update_daily_demand_rollup();
+
+DROP TRIGGER IF EXISTS trg_update_daily_demand_rollup_update ON public.visitor_demand;
+CREATE TRIGGER trg_update_daily_demand_rollup_update
+AFTER UPDATE ON public.visitor_demand
+REFERENCING OLD TABLE AS old_demands NEW TABLE AS new_demands
+FOR EACH STATEMENT EXECUTE FUNCTION update_daily_demand_rollup();
+
+DROP TRIGGER IF EXISTS trg_update_daily_demand_rollup_delete ON public.visitor_demand;
+CREATE TRIGGER trg_update_daily_demand_rollup_delete
+AFTER DELETE ON public.visitor_demand
+REFERENCING OLD TABLE AS old_demands
+FOR EACH STATEMENT EXECUTE FUNCTION update_daily_demand_rollup();
+
+-- Backfill from the current source tables
+TRUNCATE public.daily_lot_rollup, public.daily_demand_rollup;
+
+INSERT INTO public.daily_lot_rollup (date, parking_lot_id, capacity, truck_limit, bus_limit)
+SELECT d.date::date, pc.parking_lot_id, SUM(pc.capacity), SUM(pc.truck_limit), SUM(pc.bus_limit)
+FROM public.parking_lot_capacity pc
+CROSS JOIN LATERAL generate_series(pc.valid_from, pc.valid_to, '1 day'::interval) AS d(date)
+GROUP BY d.date, pc.parking_lot_id;
+
+INSERT INTO public.daily_lot_rollup (date, parking_lot_id, allocated_capacity, cars, trucks, buses)
+SELECT date, parking_lot_id, SUM(allocated_capacity), SUM(allocated_cars), SUM(allocated_trucks), SUM(allocated_buses)
+FROM public.parking_lot_allocation
+GROUP BY date, parking_lot_id
+ON CONFLICT (date, parking_lot_id) DO UPDATE
+SET allocated_capacity = EXCLUDED.allocated_capacity,
+    cars = EXCLUDED.cars,
+    trucks = EXCLUDED.trucks,
+    buses = EXCLUDED.buses;
+
+INSERT INTO public.daily_demand_rollup (date, demand, car_demand, truck_demand, bus_demand, entries)
+SELECT date, SUM(demand), SUM(car_demand), SUM(truck_demand), SUM(bus_demand), COUNT(*)
+FROM public.visitor_demand
+GROUP BY date;
@@ -1,3 +1,11 @@
+-- Extensions
+
+-- btree_gist lets the capacity exclusion constraint combine parking_lot_id (=) with a range (&&)
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- pg_trgm backs the trigram indexes used by the ranked name search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Tables
 
 CREATE TABLE users (
@@ -20,6 +28,16 @@ CREATE TABLE user_log (
     page_accessed VARCHAR(255) NOT NULL
 );
 
+-- Daily page-view counts of user_log rows past retention (filled by `flask rollup-user-log`)
+CREATE TABLE user_log_daily (
+    date DATE NOT NULL,
+    page_accessed VARCHAR(255) NOT NULL,
+    views INTEGER NOT NULL,
+    unique_users INTEGER NOT NULL,
+    unique_sessions INTEGER NOT NULL,
+    PRIMARY KEY (date, page_accessed)
+);
+
 CREATE TABLE public.hall (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL UNIQUE,
@@ -82,7 +100,9 @@ CREATE TABLE public.parking_lot_capacity (
     bus_limit INTEGER NOT NULL,
     valid_from DATE NOT NULL,
     valid_to DATE NOT NULL,
-    CHECK (capacity >= truck_limit * 4 AND capacity >= bus_limit * 3)
+    validity DATERANGE GENERATED ALWAYS AS (daterange(valid_from, valid_to, '[]')) STORED,
+    CHECK (capacity >= truck_limit * 4 AND capacity >= bus_limit * 3),
+    CONSTRAINT parking_lot_capacity_no_overlap EXCLUDE USING gist (parking_lot_id WITH =, validity WITH &&)
 );
 
 CREATE TABLE public.parking_lot_allocation (
@@ -119,15 +139,22 @@ CREATE TABLE public.entrance_parking_lot_distance (
 );
 
 -- Triggers
+-- Statement-level: validates all rows written by one statement at once via the new_demands transition table
 CREATE OR REPLACE FUNCTION check_date_within_event_period() RETURNS TRIGGER AS $$
+DECLARE
+    violation RECORD;
 BEGIN
-    IF NOT (
-        NEW.date BETWEEN COALESCE((SELECT early_assembly_start_date FROM public.event WHERE id = NEW.event_id), (SELECT assembly_start_date FROM public.event WHERE id = NEW.event_id))
-        AND COALESCE((SELECT late_disassembly_end_date FROM public.event WHERE id = NEW.event_id), (SELECT disassembly_end_date FROM public.event WHERE id = NEW.event_id))
-    ) THEN
-        RAISE EXCEPTION 'Date out of event period';
+    SELECT n.event_id, n.date INTO violation
+    FROM new_demands n
+    JOIN public.event e ON e.id = n.event_id
+    WHERE NOT n.date BETWEEN COALESCE(e.early_assembly_start_date, e.assembly_start_date)
+        AND COALESCE(e.late_disassembly_end_date, e.disassembly_end_date)
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION 'Date out of event period (event_id: %, date: %)', violation.event_id, violation.date;
     END IF;
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -153,39 +180,61 @@ CREATE TRIGGER trg_check_parking_lot_capacity_constraints
 BEFORE INSERT OR UPDATE ON public.parking_lot_capacity
 FOR EACH ROW EXECUTE FUNCTION check_parking_lot_capacity_constraints();
 
+-- Statement-level: re-sums only the (lot, date) pairs touched by the statement (new_allocations transition table)
 CREATE OR REPLACE FUNCTION check_allocation_within_capacity() RETURNS TRIGGER AS $$
 DECLARE
-    total_allocated_capacity INTEGER;
-    available_capacity INTEGER;
+    violation RECORD;
 BEGIN
-    SELECT SUM(allocated_capacity)
-    INTO total_allocated_capacity
-    FROM public.parking_lot_allocation
-    WHERE parking_lot_id = NEW.parking_lot_id
-    AND date = NEW.date
-    AND event_id != NEW.event_id;
-
-    SELECT capacity INTO available_capacity
-    FROM public.parking_lot_capacity
-    WHERE parking_lot_id = NEW.parking_lot_id
-    AND valid_from <= NEW.date
-    AND valid_to >= NEW.date;
-
-    IF (total_allocated_capacity + NEW.allocated_capacity) > available_capacity THEN
-        RAISE EXCEPTION 'Allocated capacity exceeds the available capacity for parking_lot_id: %, date: %, total_allocated: %, new_allocation: %, available_capacity: %', 
-            NEW.parking_lot_id, NEW.date, total_allocated_capacity, NEW.allocated_capacity, available_capacity;
+    WITH touched AS (
+        SELECT DISTINCT parking_lot_id, date FROM new_allocations
+    ),
+    allocated AS (
+        SELECT t.parking_lot_id, t.date, SUM(pa.allocated_capacity) AS total_allocated
+        FROM touched t
+        JOIN public.parking_lot_allocation pa ON pa.parking_lot_id = t.parking_lot_id AND pa.date = t.date
+        GROUP BY t.parking_lot_id, t.date
+    ),
+    capacity AS (
+        SELECT t.parking_lot_id, t.date, SUM(pc.capacity) AS available_capacity
+        FROM touched t
+        JOIN public.parking_lot_capacity pc ON pc.parking_lot_id = t.parking_lot_id
+            AND pc.validity @> t.date
+        GROUP BY t.parking_lot_id, t.date
+    )
+    SELECT a.parking_lot_id, a.date, a.total_allocated, c.available_capacity INTO violation
+    FROM allocated a
+    JOIN capacity c ON c.parking_lot_id = a.parking_lot_id AND c.date = a.date
+    WHERE a.total_allocated > c.available_capacity
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION 'Allocated capacity exceeds the available capacity for parking_lot_id: %, date: %, total_allocated: %, available_capacity: %',
+            violation.parking_lot_id, violation.date, violation.total_allocated, violation.available_capacity;
     END IF;
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trg_check_date_within_event_period
-BEFORE INSERT OR UPDATE ON public.visitor_demand
-FOR EACH ROW EXECUTE FUNCTION check_date_within_event_period();
+-- Transition tables can only be declared on single-event triggers, hence separate INSERT and UPDATE triggers.
+CREATE TRIGGER trg_check_date_within_event_period_insert
+AFTER INSERT ON public.visitor_demand
+REFERENCING NEW TABLE AS new_demands
+FOR EACH STATEMENT EXECUTE FUNCTION check_date_within_event_period();
+
+CREATE TRIGGER trg_check_date_within_event_period_update
+AFTER UPDATE ON public.visitor_demand
+REFERENCING NEW TABLE AS new_demands
+FOR EACH STATEMENT EXECUTE FUNCTION check_date_within_event_period();
+
+CREATE TRIGGER trg_check_allocation_within_capacity_insert
+AFTER INSERT ON public.parking_lot_allocation
+REFERENCING NEW TABLE AS new_allocations
+FOR EACH STATEMENT EXECUTE FUNCTION check_allocation_within_capacity();
 
-CREATE TRIGGER trg_check_allocation_within_capacity
-BEFORE INSERT OR UPDATE ON public.parking_lot_allocation
-FOR EACH ROW EXECUTE FUNCTION check_allocation_within_capacity();
+CREATE TRIGGER trg_check_allocation_within_capacity_update
+AFTER UPDATE ON public.parking_lot_allocation
+REFERENCING NEW TABLE AS new_allocations
+FOR EACH STATEMENT EXECUTE FUNCTION check_allocation_within_capacity();
 
 -- Indexes for performance improvements
 CREATE INDEX idx_event_id ON public.hall_occupation(event_id);
@@ -201,12 +250,14 @@ CREATE INDEX idx_user_log_user_name ON user_log(user_name);
 CREATE INDEX idx_user_log_email ON user_log(email);
 CREATE INDEX idx_user_log_timestamp ON user_log(timestamp);
 CREATE INDEX idx_event_name ON public.event(name);
+CREATE INDEX idx_event_name_trgm ON public.event USING gin (name gin_trgm_ops);
+CREATE INDEX idx_parking_lot_name_trgm ON public.parking_lot USING gin (name gin_trgm_ops);
 CREATE INDEX idx_hall_occupation_event_hall_date ON public.hall_occupation(event_id, hall_id, date);
 CREATE INDEX idx_parking_lot_allocation_event_parking_date ON public.parking_lot_allocation(event_id, parking_lot_id, date);
 CREATE INDEX idx_entrance_occupation_event_entrance_date ON public.entrance_occupation(event_id, entrance_id, date);
 CREATE INDEX idx_visitor_demand_status ON public.visitor_demand(status);
 CREATE INDEX idx_visitor_demand_date ON public.visitor_demand(date);
-CREATE INDEX idx_parking_lot_capacity_valid_dates ON public.parking_lot_capacity(valid_from, valid_to);
+CREATE INDEX idx_parking_lot_capacity_validity ON public.parking_lot_capacity USING gist (validity);
 CREATE INDEX idx_view_events_timeline_dates ON view_schema.view_events_timeline(disassembly_end_date, assembly_start_date);
 CREATE INDEX idx_entrance_occupation_event_id ON public.entrance_occupation(event_id);
 CREATE INDEX idx_parking_lot_capacity_dates ON public.parking_lot_capacity(valid_from, valid_to, utilization_type, parking_lot_id);
@@ -0,0 +1,12 @@
+-- Migration: user_log retention rollup
+-- Existing databases only; create_tables.sql already contains the table.
+
+-- Daily page-view counts of user_log rows past retention (filled by `flask rollup-user-log`)
+CREATE TABLE IF NOT EXISTS user_log_daily (
+    date DATE NOT NULL,
+    page_accessed VARCHAR(255) NOT NULL,
+    views INTEGER NOT NULL,
+    unique_users INTEGER NOT NULL,
+    unique_sessions INTEGER NOT NULL,
+    PRIMARY KEY (date, page_accessed)
+);
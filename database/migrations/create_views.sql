@@ -1,22 +1,22 @@
 -- Create view schema
 CREATE SCHEMA IF NOT EXISTS view_schema;
 
--- Create the demand vs capacity view
+-- Create the demand vs capacity view (reads the daily rollups from create_rollups.sql)
 CREATE OR REPLACE VIEW view_schema.view_demand_vs_capacity AS
 SELECT
-    vd.date,
-    SUM(vd.demand) AS total_demand,
+    dd.date,
+    dd.demand::bigint AS total_demand,
     COALESCE((
-        SELECT SUM(plc.capacity)
-        FROM public.parking_lot_capacity plc
-        WHERE vd.date BETWEEN plc.valid_from AND plc.valid_to
+        SELECT SUM(dl.capacity)
+        FROM public.daily_lot_rollup dl
+        WHERE dl.date = dd.date
     ), 0) AS total_capacity
 FROM
-    public.visitor_demand vd
-GROUP BY
-    vd.date
+    public.daily_demand_rollup dd
+WHERE
+    dd.entries > 0
 ORDER BY
-    vd.date;
+    dd.date;
 
 -- Create the events parking lots allocation view
 CREATE OR REPLACE VIEW view_schema.view_events_parking_lots_allocation AS
@@ -87,7 +87,7 @@ WITH EventHalls AS (
         JOIN public.hall_occupation ho ON e.id = ho.event_id AND vd.date = ho.date 
         JOIN public.hall h ON ho.hall_id = h.id 
         JOIN public.parking_lot pl ON pl.id = pl.id
-        JOIN public.parking_lot_capacity pc ON pl.id = pc.parking_lot_id AND vd.date BETWEEN pc.valid_from AND pc.valid_to 
+        JOIN public.parking_lot_capacity pc ON pl.id = pc.parking_lot_id AND pc.validity @> vd.date 
         LEFT JOIN public.entrance_occupation eo ON e.id = eo.event_id AND vd.date = eo.date
         LEFT JOIN public.entrance en ON eo.entrance_id = en.id
         LEFT JOIN public.entrance_parking_lot_distance epd ON eo.entrance_id = epd.entrance_id AND pl.id = epd.parking_lot_id
@@ -179,6 +179,6 @@ JOIN
 JOIN 
     public.parking_lot_capacity plc ON pl.id = plc.parking_lot_id
 WHERE 
-    pla.date BETWEEN plc.valid_from AND plc.valid_to
+    plc.validity @> pla.date
 ORDER BY 
     pla.date, pl.name;
\ No newline at end of file
@@ -0,0 +1,104 @@
+-- Migration: parking_lot_capacity validity as a daterange
+-- Adds the generated validity column, a GiST index on it and an exclusion constraint that forbids
+-- overlapping validity windows per parking lot, and moves the capacity trigger and rollup refresh to
+-- range containment. Existing databases only; create_tables.sql and create_rollups.sql already contain
+-- the new definitions. Re-run create_views.sql afterwards to pick up the rewritten views.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- The exclusion constraint cannot be added while overlapping windows exist; list them and abort
+DO $$
+DECLARE
+    overlap RECORD;
+    overlap_count INTEGER := 0;
+BEGIN
+    FOR overlap IN
+        SELECT a.parking_lot_id, a.id AS first_id, b.id AS second_id,
+               a.valid_from AS first_from, a.valid_to AS first_to,
+               b.valid_from AS second_from, b.valid_to AS second_to
+        FROM public.parking_lot_capacity a
+        JOIN public.parking_lot_capacity b ON a.parking_lot_id = b.parking_lot_id AND a.id < b.id
+        WHERE a.valid_from <= b.valid_to AND b.valid_from <= a.valid_to
+        ORDER BY a.parking_lot_id, a.id, b.id
+    LOOP
+        overlap_count := overlap_count + 1;
+        RAISE WARNING 'Overlapping capacities for parking_lot_id %: id % (% - %) and id % (% - %)',
+            overlap.parking_lot_id, overlap.first_id, overlap.first_from, overlap.first_to,
+            overlap.second_id, overlap.second_from, overlap.second_to;
+    END LOOP;
+
+    IF overlap_count > 0 THEN
+        RAISE EXCEPTION '% overlapping parking_lot_capacity pairs, fix the validity windows before migrating', overlap_count;
+    END IF;
+END;
+$$;
+
+ALTER TABLE public.parking_lot_capacity
+    ADD COLUMN validity DATERANGE GENERATED ALWAYS AS (daterange(valid_from, valid_to, '[]')) STORED;
+
+ALTER TABLE public.parking_lot_capacity
+    ADD CONSTRAINT parking_lot_capacity_no_overlap EXCLUDE USING gist (parking_lot_id WITH =, validity WITH &&);
+
+DROP INDEX IF EXISTS public.idx_parking_lot_capacity_valid_dates;
+CREATE INDEX idx_parking_lot_capacity_validity ON public.parking_lot_capacity USING gist (validity);
+
+-- Statement-level: re-sums only the (lot, date) pairs touched by the statement (new_allocations transition table)
+CREATE OR REPLACE FUNCTION check_allocation_within_capacity() RETURNS TRIGGER AS $$
+DECLARE
+    violation RECORD;
+BEGIN
+    WITH touched AS (
+        SELECT DISTINCT parking_lot_id, date FROM new_allocations
+    ),
+    allocated AS (
+        SELECT t.parking_lot_id, t.date, SUM(pa.allocated_capacity) AS total_allocated
+        FROM touched t
+        JOIN public.parking_lot_allocation pa ON pa.parking_lot_id = t.parking_lot_id AND pa.date = t.date
+        GROUP BY t.parking_lot_id, t.date
+    ),
+    capacity AS (
+        SELECT t.parking_lot_id, t.date, SUM(pc.capacity) AS available_capacity
+        FROM touched t
+        JOIN public.parking_lot_capacity pc ON pc.parking_lot_id = t.parking_lot_id
+            AND pc.validity @> t.date
+        GROUP BY t.parking_lot_id, t.date
+    )
+    SELECT a.parking_lot_id, a.date, a.total_allocated, c.available_capacity INTO violation
+    FROM allocated a
+    JOIN capacity c ON c.parking_lot_id = a.parking_lot_id AND c.date = a.date
+    WHERE a.total_allocated > c.available_capacity
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION 'Allocated capacity exceeds the available capacity for parking_lot_id: %, date: %, total_allocated: %, available_capacity: %',
+            violation.parking_lot_id, violation.date, violation.total_allocated, violation.available_capacity;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Capacity: recompute the capacity columns of one lot for the affected validity window
+CREATE OR REPLACE FUNCTION refresh_daily_lot_rollup_capacity(p_parking_lot_id INTEGER, p_from DATE, p_to DATE) RETURNS VOID AS $$
+BEGIN
+    UPDATE public.daily_lot_rollup
+    SET capacity = NULL, truck_limit = NULL, bus_limit = NULL
+    WHERE parking_lot_id = p_parking_lot_id
+    AND date BETWEEN p_from AND p_to;
+
+    INSERT INTO public.daily_lot_rollup (date, parking_lot_id, capacity, truck_limit, bus_limit)
+    SELECT d.date::date, pc.parking_lot_id, SUM(pc.capacity), SUM(pc.truck_limit), SUM(pc.bus_limit)
+    FROM public.parking_lot_capacity pc
+    CROSS JOIN LATERAL generate_series(GREATEST(pc.valid_from, p_from), LEAST(pc.valid_to, p_to), '1 day'::interval) AS d(date)
+    WHERE pc.parking_lot_id = p_parking_lot_id
+    AND pc.validity && daterange(p_from, p_to, '[]')
+    GROUP BY d.date, pc.parking_lot_id
+    ON CONFLICT (date, parking_lot_id) DO UPDATE
+    SET capacity = EXCLUDED.capacity,
+        truck_limit = EXCLUDED.truck_limit,
+        bus_limit = EXCLUDED.bus_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,20 @@
+-- Migration: 'lots' data version scope
+-- Existing databases only; create_data_version.sql already contains the scope and its triggers.
+
+BEGIN;
+
+INSERT INTO public.data_version (scope) VALUES ('lots')
+ON CONFLICT (scope) DO NOTHING;
+
+-- lots: parking lot attributes and entrance distances behind the recommendation lot rankings
+DROP TRIGGER IF EXISTS trg_bump_data_version_lots_parking_lot ON public.parking_lot;
+CREATE TRIGGER trg_bump_data_version_lots_parking_lot
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.parking_lot
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('lots');
+
+DROP TRIGGER IF EXISTS trg_bump_data_version_lots_entrance_parking_lot_distance ON public.entrance_parking_lot_distance;
+CREATE TRIGGER trg_bump_data_version_lots_entrance_parking_lot_distance
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.entrance_parking_lot_distance
+FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('lots');
+
+COMMIT;
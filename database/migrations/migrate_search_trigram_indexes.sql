@@ -0,0 +1,8 @@
+-- Migration: trigram indexes for the name search
+-- Lets ILIKE '%q%' / 'q%' and similarity() in /data/search use an index instead of scanning event and parking_lot.
+-- Existing databases only; create_tables.sql already contains the extension and the indexes.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_event_name_trgm ON public.event USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_parking_lot_name_trgm ON public.parking_lot USING gin (name gin_trgm_ops);
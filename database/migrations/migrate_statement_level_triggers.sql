@@ -0,0 +1,85 @@
+-- Migration: statement-level validation triggers
+-- Replaces the row-level check_date_within_event_period and check_allocation_within_capacity triggers
+-- with statement-level triggers over transition tables, so bulk writes are validated in one set-based check.
+-- Existing databases only; create_tables.sql already contains the new definitions.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS trg_check_date_within_event_period ON public.visitor_demand;
+DROP TRIGGER IF EXISTS trg_check_allocation_within_capacity ON public.parking_lot_allocation;
+
+-- Statement-level: validates all rows written by one statement at once via the new_demands transition table
+CREATE OR REPLACE FUNCTION check_date_within_event_period() RETURNS TRIGGER AS $$
+DECLARE
+    violation RECORD;
+BEGIN
+    SELECT n.event_id, n.date INTO violation
+    FROM new_demands n
+    JOIN public.event e ON e.id = n.event_id
+    WHERE NOT n.date BETWEEN COALESCE(e.early_assembly_start_date, e.assembly_start_date)
+        AND COALESCE(e.late_disassembly_end_date, e.disassembly_end_date)
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION 'Date out of event period (event_id: %, date: %)', violation.event_id, violation.date;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level: re-sums only the (lot, date) pairs touched by the statement (new_allocations transition table)
+CREATE OR REPLACE FUNCTION check_allocation_within_capacity() RETURNS TRIGGER AS $$
+DECLARE
+    violation RECORD;
+BEGIN
+    WITH touched AS (
+        SELECT DISTINCT parking_lot_id, date FROM new_allocations
+    ),
+    allocated AS (
+        SELECT t.parking_lot_id, t.date, SUM(pa.allocated_capacity) AS total_allocated
+        FROM touched t
+        JOIN public.parking_lot_allocation pa ON pa.parking_lot_id = t.parking_lot_id AND pa.date = t.date
+        GROUP BY t.parking_lot_id, t.date
+    ),
+    capacity AS (
+        SELECT t.parking_lot_id, t.date, SUM(pc.capacity) AS available_capacity
+        FROM touched t
+        JOIN public.parking_lot_capacity pc ON pc.parking_lot_id = t.parking_lot_id
+            AND t.date BETWEEN pc.valid_from AND pc.valid_to
+        GROUP BY t.parking_lot_id, t.date
+    )
+    SELECT a.parking_lot_id, a.date, a.total_allocated, c.available_capacity INTO violation
+    FROM allocated a
+    JOIN capacity c ON c.parking_lot_id = a.parking_lot_id AND c.date = a.date
+    WHERE a.total_allocated > c.available_capacity
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION 'Allocated capacity exceeds the available capacity for parking_lot_id: %, date: %, total_allocated: %, available_capacity: %',
+            violation.parking_lot_id, violation.date, violation.total_allocated, violation.available_capacity;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_check_date_within_event_period_insert
+AFTER INSERT ON public.visitor_demand
+REFERENCING NEW TABLE AS new_demands
+FOR EACH STATEMENT EXECUTE FUNCTION check_date_within_event_period();
+
+CREATE TRIGGER trg_check_date_within_event_period_update
+AFTER UPDATE ON public.visitor_demand
+REFERENCING NEW TABLE AS new_demands
+FOR EACH STATEMENT EXECUTE FUNCTION check_date_within_event_period();
+
+CREATE TRIGGER trg_check_allocation_within_capacity_insert
+AFTER INSERT ON public.parking_lot_allocation
+REFERENCING NEW TABLE AS new_allocations
+FOR EACH STATEMENT EXECUTE FUNCTION check_allocation_within_capacity();
+
+CREATE TRIGGER trg_check_allocation_within_capacity_update
+AFTER UPDATE ON public.parking_lot_allocation
+REFERENCING NEW TABLE AS new_allocations
+FOR EACH STATEMENT EXECUTE FUNCTION check_allocation_within_capacity();
+
+COMMIT;
@@ -25,7 +25,7 @@ function SearchAppBar() {
     const fetchResults = async () => {
       try {
         const response = await axios.get("/api/data/search", {
-          params: { q: query },
+          params: { q: query, limit: 20 },
         });
 
         if (response.status === 204) {
@@ -20,6 +20,27 @@ import {
 import axios from "axios";
 
 const TITLE = "Map";
+// Days fetched and held on each side of the selected date
+const WINDOW_RADIUS_DAYS = 365;
+
+// Drop everything outside [start, end] so the held window stays bounded
+const trimTimeline = (data, start, end) => {
+  const inWindow = (row) => {
+    const day = dayjs(row.date);
+    return !day.isBefore(start, "day") && !day.isAfter(end, "day");
+  };
+  return {
+    ...data,
+    events_timeline: data.events_timeline.filter(
+      (event) =>
+        !dayjs(event.disassembly_end_date).isBefore(start, "day") &&
+        !dayjs(event.assembly_start_date).isAfter(end, "day"),
+    ),
+    parking_lots_capacity: data.parking_lots_capacity.filter(inWindow),
+    parking_lots_occupancy: data.parking_lots_occupancy.filter(inWindow),
+    parking_lots_allocations: data.parking_lots_allocations.filter(inWindow),
+  };
+};
 
 const MapPage = () => {
   const location = useLocation();
@@ -31,17 +52,33 @@ const MapPage = () => {
   const [loading, setLoading] = useState(true);
   const [selectedEventId] = useState(null);
   const [showHeatmap, setShowHeatmap] = useState(false);
-  const [mapData, setMapData] = useState(null);
+  const [geometry, setGeometry] = useState(null);
+  const [timeline, setTimeline] = useState(null);
   const [initialLoading, setInitialLoading] = useState(true);
-  const [initialFetch, setInitialFetch] = useState(true);
   const [reloading, setReloading] = useState(false);
 
+  // Window of days held in `timeline` and the server data version it belongs to
   const currentFetchedTimeRange = useRef({
-    start: dayjs().subtract(365, "days"),
-    end: dayjs().add(365, "days"),
+    start: null,
+    end: null,
+    version: null,
   });
 
-  const fetchMapData = useCallback(
+  useEffect(() => {
+    const fetchGeometry = async () => {
+      try {
+        // Revalidated with If-None-Match by the browser; 304 until geometry changes
+        const { data } = await axios.get("/api/map/geometry");
+        setGeometry(data);
+      } catch (error) {
+        console.error("Error fetching map geometry:", error);
+      }
+    };
+
+    fetchGeometry();
+  }, []);
+
+  const fetchTimeline = useCallback(
     async (date) => {
       if (initialLoading) {
         setLoading(true);
@@ -50,12 +87,70 @@ const MapPage = () => {
         setReloading(true);
       }
       try {
-        const { data } = await axios.get(`/api/map/map_data/${date}`);
-        setMapData(data || {});
+        const { start, end, version } = currentFetchedTimeRange.current;
+        const windowStart = dayjs(date).subtract(WINDOW_RADIUS_DAYS, "days");
+        const windowEnd = dayjs(date).add(WINDOW_RADIUS_DAYS, "days");
+        let from = windowStart;
+        let to = windowEnd;
+        const overlaps =
+          start && end && !from.isAfter(end) && !to.isBefore(start);
+
+        // Only ask for the days that are not held yet
+        const params = { from: from.format("YYYY-MM-DD") };
+        if (overlaps) {
+          if (from.isBefore(start)) {
+            to = start.subtract(1, "day");
+          } else {
+            from = end.add(1, "day");
+          }
+          params.from = from.format("YYYY-MM-DD");
+          params.version = version;
+          params.known_from = start.format("YYYY-MM-DD");
+          params.known_to = end.format("YYYY-MM-DD");
+        }
+        params.to = to.format("YYYY-MM-DD");
+        if (from.isAfter(to)) {
+          return;
+        }
 
-        const start = dayjs(date).subtract(365, "days");
-        const end = dayjs(date).add(365, "days");
-        currentFetchedTimeRange.current = { start, end };
+        const { data } = await axios.get("/api/map/timeline", { params });
+
+        if (!overlaps || data.version !== version) {
+          setTimeline(trimTimeline(data, windowStart, windowEnd));
+        } else {
+          setTimeline((previous) => {
+            const knownEventIds = new Set(
+              previous.events_timeline.map((event) => event.event_id),
+            );
+            const merged = {
+              events_timeline: [
+                ...previous.events_timeline,
+                ...data.events_timeline.filter(
+                  (event) => !knownEventIds.has(event.event_id),
+                ),
+              ],
+              parking_lots_capacity: [
+                ...previous.parking_lots_capacity,
+                ...data.parking_lots_capacity,
+              ],
+              parking_lots_occupancy: [
+                ...previous.parking_lots_occupancy,
+                ...data.parking_lots_occupancy,
+              ],
+              parking_lots_allocations: [
+                ...previous.parking_lots_allocations,
+                ...data.parking_lots_allocations,
+              ],
+            };
+            return trimTimeline(merged, windowStart, windowEnd);
+          });
+        }
+        // The held window is always the radius around the requested date
+        currentFetchedTimeRange.current = {
+          start: windowStart,
+          end: windowEnd,
+          version: data.version,
+        };
       } catch (error) {
         console.error("Error fetching map data:", error);
       } finally {
@@ -71,29 +166,25 @@ const MapPage = () => {
   );
 
   useEffect(() => {
-    if (initialFetch) {
-      fetchMapData(selectedDate);
-      setInitialFetch(false);
+    const { start, end } = currentFetchedTimeRange.current;
+    if (!start || !end) {
+      if (initialLoading) {
+        fetchTimeline(selectedDate);
+      }
+      return;
     }
-  }, [fetchMapData, selectedDate, initialFetch]);
+    const selected = dayjs(selectedDate);
 
-  useEffect(() => {
-    if (
-      currentFetchedTimeRange.current.start &&
-      currentFetchedTimeRange.current.end
-    ) {
-      const start = currentFetchedTimeRange.current.start;
-      const end = currentFetchedTimeRange.current.end;
-      const selected = dayjs(selectedDate);
-
-      const withinFetchedRange =
-        selected.isAfter(start.add(0.2 * 365, "days")) &&
-        selected.isBefore(end.subtract(0.2 * 365, "days"));
-      if (!withinFetchedRange) {
-        fetchMapData(selectedDate);
-      }
+    const withinFetchedRange =
+      selected.isAfter(start.add(0.2 * 365, "days")) &&
+      selected.isBefore(end.subtract(0.2 * 365, "days"));
+    if (!withinFetchedRange && !reloading) {
+      fetchTimeline(selectedDate);
     }
-  }, [fetchMapData, selectedDate, reloading]);
+  }, [fetchTimeline, selectedDate, reloading, initialLoading]);
+
+  const mapData =
+    timeline && geometry ? { ...timeline, coordinates: geometry } : timeline;
 
   const filterDataForSelectedDay = (data, date) => {
     if (!data || !data.parking_lots_allocations) {